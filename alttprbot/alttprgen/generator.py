@@ -1,9 +1,12 @@
 import base64
+import copy
+import datetime
 import logging
 import os
 import random
+import time
 from dataclasses import dataclass
-from typing import List
+from typing import Any, Dict, List
 
 import aiocache
 import aiofiles
@@ -25,6 +28,11 @@ from alttprbot_discord.util.alttprdoors_discord import AlttprDoorDiscord
 from alttprbot_discord.util.avianart_discord import AVIANARTDiscord
 from alttprbot_discord.util.sm_discord import SMDiscord, SMZ3Discord
 
+try:
+    from yaml import CSafeLoader as PresetLoader
+except ImportError:
+    from yaml import SafeLoader as PresetLoader
+
 
 class PresetNotFoundException(SahasrahBotException):
     pass
@@ -46,6 +54,30 @@ class WeightsetNotFoundException(SahasrahBotException):
     pass
 
 
+# how often a cached global preset re-checks the mtime of its file
+GLOBAL_PRESET_RECHECK_SECONDS = 30
+
+
+@dataclass
+class CachedPreset:
+    version: Any
+    raw: str
+    data: dict
+    checked_at: float = 0
+
+
+# parsed presets, keyed by file path for global presets and by row id for namespaced presets
+PRESET_CACHE: Dict[Any, CachedPreset] = {}
+
+
+def load_preset_yaml(content):
+    return yaml.load(content, Loader=PresetLoader)
+
+
+def invalidate_namespaced_preset(preset_id: int):
+    PRESET_CACHE.pop(('namespaced', preset_id), None)
+
+
 @aiocache.cached(ttl=60, cache=aiocache.SimpleMemoryCache)
 async def get_global_preset_list(path) -> List[str]:
     return [os.path.splitext(f)[0] for f in os.listdir(path) if f.endswith(".yaml")]
@@ -86,7 +118,7 @@ class SahasrahBotPresetCore():
     @classmethod
     async def custom(cls, content, preset_name=None):
         preset = cls(preset_name)
-        preset.preset_data = yaml.safe_load(content)
+        preset.preset_data = load_preset_yaml(content)
 
         return preset
 
@@ -138,28 +170,56 @@ class SahasrahBotPresetCore():
         self.raw = yaml.dump(self.preset_data)
         namespace_data = await models.PresetNamespaces.get(name=self.namespace)
 
-        await models.Presets.update_or_create(randomizer=self.randomizer, preset_name=self.preset,
-                                              namespace=namespace_data, defaults={'content': self.raw})
+        preset, _ = await models.Presets.update_or_create(randomizer=self.randomizer, preset_name=self.preset,
+                                                          namespace=namespace_data, defaults={'content': self.raw})
+        invalidate_namespaced_preset(preset.id)
 
     async def _fetch_global(self):
         basename = os.path.basename(f'{self.preset}.yaml')
+        path = os.path.join(self.global_preset_path, basename)
+        key = ('global', path)
+
+        cached = PRESET_CACHE.get(key)
+        now = time.monotonic()
+        if cached and now - cached.checked_at < GLOBAL_PRESET_RECHECK_SECONDS:
+            self._use_cached(cached)
+            return
+
         try:
-            async with aiofiles.open(os.path.join(self.global_preset_path, basename)) as f:
-                self.raw = await f.read()
-                self.preset_data = yaml.safe_load(self.raw)
+            mtime = os.stat(path).st_mtime_ns
+            if cached is None or cached.version != mtime:
+                async with aiofiles.open(path) as f:
+                    raw = await f.read()
+                cached = CachedPreset(version=mtime, raw=raw, data=load_preset_yaml(raw))
+                PRESET_CACHE[key] = cached
         except FileNotFoundError as err:
+            PRESET_CACHE.pop(key, None)
             raise PresetNotFoundException(
                 f'Could not find preset {self.preset}.  See a list of available presets at https://sahasrahbot.synack.live/presets.html') from err
 
+        cached.checked_at = now
+        self._use_cached(cached)
+
     async def _fetch_namespaced(self):
-        data = await models.Presets.get_or_none(preset_name=self.preset, randomizer=self.randomizer,
-                                                namespace__name=self.namespace)
+        row = await models.Presets.filter(preset_name=self.preset, randomizer=self.randomizer,
+                                          namespace__name=self.namespace).first().values('id', 'modified')
 
-        if data is None:
+        if row is None:
             raise PresetNotFoundException(f'Could not find preset {self.preset} in namespace {self.namespace}.')
 
-        self.raw = data.content
-        self.preset_data = yaml.safe_load(self.raw)
+        key = ('namespaced', row['id'])
+        cached = PRESET_CACHE.get(key)
+        if cached is None or cached.version != row['modified']:
+            data = await models.Presets.get(id=row['id'])
+            cached = CachedPreset(version=data.modified, raw=data.content, data=load_preset_yaml(data.content))
+            PRESET_CACHE[key] = cached
+
+        self._use_cached(cached)
+
+    def _use_cached(self, cached: CachedPreset):
+        # generators modify preset_data in place, so never hand out the cached dict itself
+        self.raw = cached.raw
+        self.preset_data = copy.deepcopy(cached.data)
 
 
 class ALTTPRPreset(SahasrahBotPresetCore):
@@ -168,7 +228,7 @@ class ALTTPRPreset(SahasrahBotPresetCore):
     # TODO: Make this so it isn't an absolute dumpster fire
     # this code really sucks
     async def generate(self, hints=False, nohints=False, spoilers="off", tournament=True, allow_quickswap=False,
-                       endpoint_prefix="", branch=None) -> ALTTPRDiscord:
+                       endpoint_prefix="", branch=None, handed_out=True, queue_callback=None) -> ALTTPRDiscord:
         if self.preset_data is None:
             await self.fetch()
 
@@ -188,7 +248,8 @@ class ALTTPRPreset(SahasrahBotPresetCore):
             seed = await AlttprDoorDiscord.create(
                 settings=settings,
                 spoilers=spoilers == "on",
-                branch=branch
+                branch=branch,
+                queue_callback=queue_callback
             )
             hash_id = seed.hash
         elif avianart:
@@ -263,7 +324,8 @@ class ALTTPRPreset(SahasrahBotPresetCore):
             genoption=self.preset,
             customizer=1 if self.preset_data.get('customizer', False) else 0,
             doors=doors,
-            avianart=avianart
+            avianart=avianart,
+            handed_out_at=datetime.datetime.now(datetime.timezone.utc) if handed_out else None,
         )
         return seed
 
@@ -275,7 +337,7 @@ class ALTTPRMystery(SahasrahBotPresetCore):
     def global_preset_path(self) -> str:
         return "presets/alttprmystery"
 
-    async def generate(self, spoilers="off", tournament=True, allow_quickswap=True):
+    async def generate(self, spoilers="off", tournament=True, allow_quickswap=True, queue_callback=None):
         if self.preset_data is None:
             await self.fetch()
 
@@ -290,7 +352,8 @@ class ALTTPRMystery(SahasrahBotPresetCore):
                             seed = await AlttprDoorDiscord.create(
                                 settings=mystery.settings,
                                 spoilers=spoilers != "mystery",
-                                branch=mystery.branch
+                                branch=mystery.branch,
+                                queue_callback=queue_callback
                             )
                         else:
                             if mystery.customizer:
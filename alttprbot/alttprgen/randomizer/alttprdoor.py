@@ -8,6 +8,10 @@ import re
 import string
 import tempfile
 import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Optional
 
 import aioboto3
 import aiofiles
@@ -15,6 +19,131 @@ from tenacity import RetryError, AsyncRetrying, stop_after_attempt, retry_if_exc
 
 import config
 
+# each DungeonRandomizer.py run pins a CPU core for a while, so only a few are allowed at once
+DOOR_GENERATION_WORKERS = getattr(config, 'DOOR_GENERATION_WORKERS', 2)
+DOOR_GENERATION_TIMEOUT = getattr(config, 'DOOR_GENERATION_TIMEOUT', 300)
+
+
+class DoorGenerationTimeout(Exception):
+    pass
+
+
+@dataclass
+class DoorGenerationJob:
+    func: Callable[[], Awaitable]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    task: Optional[asyncio.Task] = None
+
+    def cancel(self):
+        if self.task:
+            self.task.cancel()
+        self.future.cancel()
+
+
+class DoorGenerationQueue:
+    """
+    A FIFO queue in front of a fixed number of door randomizer workers.
+    """
+
+    def __init__(self, workers: int, timeout: int):
+        self.workers = workers
+        self.timeout = timeout
+        self.pending: Deque[DoorGenerationJob] = deque()
+        self.running = 0
+        self.stats = {
+            'completed': 0,
+            'failed': 0,
+            'timed_out': 0,
+            'cancelled': 0,
+            'total_wait': 0.0,
+            'total_duration': 0.0,
+            'max_duration': 0.0,
+            'max_depth': 0,
+        }
+
+    def position(self, job: DoorGenerationJob) -> int:
+        """
+        Returns how many jobs are ahead of this one, 0 once it is running.
+        """
+        try:
+            return self.pending.index(job) + 1
+        except ValueError:
+            return 0
+
+    def submit(self, func: Callable[[], Awaitable]) -> DoorGenerationJob:
+        job = DoorGenerationJob(func=func, future=asyncio.get_running_loop().create_future())
+        self.pending.append(job)
+        self.stats['max_depth'] = max(self.stats['max_depth'], len(self.pending))
+        self._dispatch()
+        return job
+
+    async def run(self, func: Callable[[], Awaitable], queue_callback=None):
+        """
+        Runs func on a worker once one frees up.  queue_callback, if given, is awaited with the
+        job's queue position when it cannot start right away.  Cancelling the caller cancels the job.
+        """
+        job = self.submit(func)
+        try:
+            if queue_callback and (position := self.position(job)):
+                await queue_callback(position)
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            job.cancel()
+            raise
+
+    def _dispatch(self):
+        while self.running < self.workers and self.pending:
+            job = self.pending.popleft()
+            if job.future.done():
+                continue
+            self.running += 1
+            job.started_at = time.monotonic()
+            job.task = asyncio.create_task(self._run_job(job))
+
+    async def _run_job(self, job: DoorGenerationJob):
+        wait = job.started_at - job.enqueued_at
+        self.stats['total_wait'] += wait
+        try:
+            result = await asyncio.wait_for(job.func(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timed_out'] += 1
+            if not job.future.done():
+                job.future.set_exception(DoorGenerationTimeout(f"Door randomizer generation took longer than {self.timeout} seconds."))
+        except asyncio.CancelledError:
+            self.stats['cancelled'] += 1
+        except Exception as e:
+            self.stats['failed'] += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.stats['completed'] += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            duration = time.monotonic() - job.started_at
+            self.stats['total_duration'] += duration
+            self.stats['max_duration'] = max(self.stats['max_duration'], duration)
+            self.running -= 1
+            logging.info("Door generation finished in %.1fs after waiting %.1fs, %s still queued.",
+                         duration, wait, len(self.pending))
+            self._dispatch()
+
+    def get_stats(self) -> dict:
+        finished = self.stats['completed'] + self.stats['failed'] + self.stats['timed_out'] + self.stats['cancelled']
+        return {
+            'workers': self.workers,
+            'running': self.running,
+            'queued': len(self.pending),
+            **self.stats,
+            'avg_wait': self.stats['total_wait'] / finished if finished else 0,
+            'avg_duration': self.stats['total_duration'] / finished if finished else 0,
+        }
+
+
+door_generation_queue = DoorGenerationQueue(workers=DOOR_GENERATION_WORKERS, timeout=DOOR_GENERATION_TIMEOUT)
+
 
 class AlttprDoor():
     def __init__(self, settings=None, spoilers=True, branch="stable"):
@@ -29,7 +158,7 @@ class AlttprDoor():
         self.spoiler_name = None
         self.spoilerfile = None
 
-    async def generate_game(self):
+    async def generate_game(self, queue_callback=None):
         with tempfile.TemporaryDirectory() as tmp:
             settings_file_path = os.path.join(tmp, "settings.json")
             self.hash = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
@@ -58,29 +187,10 @@ class AlttprDoor():
             with open(settings_file_path, "w") as f:
                 json.dump(self.settings, f)
 
-            attempts = 0
-            try:
-                async for attempt in AsyncRetrying(stop=stop_after_attempt(4),
-                                                   retry=retry_if_exception_type(Exception)):
-                    with attempt:
-                        attempts += 1
-                        proc = await asyncio.create_subprocess_exec(
-                            'python3',
-                            'DungeonRandomizer.py',
-                            '--settingsfile', settings_file_path,
-                            stdout=asyncio.subprocess.PIPE,
-                            stderr=asyncio.subprocess.PIPE,
-                            cwd=self.door_rando_location)
-
-                        stdout, stderr = await proc.communicate()
-                        logging.info(stdout.decode())
-                        if proc.returncode > 0:
-                            raise Exception(f'Exception while generating game: {stderr.decode()}')
-
-            except RetryError as e:
-                raise e.last_attempt._exception from e
-
-            self.attempts = attempts
+            self.attempts = await door_generation_queue.run(
+                lambda: self._run_randomizer(settings_file_path),
+                queue_callback=queue_callback
+            )
 
             self.patch_name = "DR_" + self.settings['outputname'] + ".bps"
             self.rom_name = "DR_" + self.settings['outputname'] + ".sfc"
@@ -90,55 +200,97 @@ class AlttprDoor():
             patch_path = os.path.join(tmp, self.patch_name)
             spoiler_path = os.path.join(tmp, self.spoiler_name)
 
-            proc = await asyncio.create_subprocess_exec(
-                os.path.join('utils', 'macos' if sys.platform == 'darwin' else 'linux', 'flips'),
-                '--create',
-                '--bps-delta',
-                config.ALTTP_ROM,
-                rom_path,
-                patch_path,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE)
-
-            stdout, stderr = await proc.communicate()
-            logging.info(stdout.decode())
-            if proc.returncode > 0:
-                raise Exception(f'Exception while while creating patch: {stderr.decode()}')
-
-            async with aiofiles.open(patch_path, "rb") as f:
-                patchfile = await f.read()
-
             session = aioboto3.Session()
             async with session.client('s3') as s3:
-                await s3.put_object(
-                    Bucket=config.SAHASRAHBOT_BUCKET,
-                    Key=f"patch/{self.patch_name}",
-                    Body=patchfile,
-                    ACL='public-read'
+                # the spoiler doesn't depend on the patch, so get it uploading while flips runs
+                await asyncio.gather(
+                    self._create_and_upload_patch(s3, rom_path, patch_path),
+                    self._upload_spoiler(s3, spoiler_path),
                 )
 
-            async with aiofiles.open(spoiler_path, "rb") as f:
-                self.spoilerfile = await f.read()
+    async def _create_and_upload_patch(self, s3, rom_path, patch_path):
+        proc = await asyncio.create_subprocess_exec(
+            os.path.join('utils', 'macos' if sys.platform == 'darwin' else 'linux', 'flips'),
+            '--create',
+            '--bps-delta',
+            config.ALTTP_ROM,
+            rom_path,
+            patch_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE)
 
-            async with session.client('s3') as s3:
-                await s3.put_object(
-                    Bucket=config.SAHASRAHBOT_BUCKET,
-                    Key=f"spoiler/{self.spoiler_name}",
-                    Body=gzip.compress(self.spoilerfile),
-                    ACL='public-read' if self.spoilers else 'private',
-                    ContentEncoding='gzip',
-                    ContentDisposition='attachment'
-                )
+        stdout, stderr = await proc.communicate()
+        logging.info(stdout.decode())
+        if proc.returncode > 0:
+            raise Exception(f'Exception while while creating patch: {stderr.decode()}')
+
+        async with aiofiles.open(patch_path, "rb") as f:
+            patchfile = await f.read()
+
+        await s3.put_object(
+            Bucket=config.SAHASRAHBOT_BUCKET,
+            Key=f"patch/{self.patch_name}",
+            Body=patchfile,
+            ACL='public-read'
+        )
+
+    async def _upload_spoiler(self, s3, spoiler_path):
+        async with aiofiles.open(spoiler_path, "rb") as f:
+            self.spoilerfile = await f.read()
+
+        body = await asyncio.get_running_loop().run_in_executor(None, gzip.compress, self.spoilerfile)
+
+        await s3.put_object(
+            Bucket=config.SAHASRAHBOT_BUCKET,
+            Key=f"spoiler/{self.spoiler_name}",
+            Body=body,
+            ACL='public-read' if self.spoilers else 'private',
+            ContentEncoding='gzip',
+            ContentDisposition='attachment'
+        )
+
+    async def _run_randomizer(self, settings_file_path):
+        attempts = 0
+        try:
+            async for attempt in AsyncRetrying(stop=stop_after_attempt(4),
+                                               retry=retry_if_exception_type(Exception)):
+                with attempt:
+                    attempts += 1
+                    proc = await asyncio.create_subprocess_exec(
+                        'python3',
+                        'DungeonRandomizer.py',
+                        '--settingsfile', settings_file_path,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE,
+                        cwd=self.door_rando_location)
+
+                    try:
+                        stdout, stderr = await proc.communicate()
+                    except asyncio.CancelledError:
+                        # timed out or cancelled, don't leave the randomizer running in the background
+                        proc.kill()
+                        await proc.wait()
+                        raise
+
+                    logging.info(stdout.decode())
+                    if proc.returncode > 0:
+                        raise Exception(f'Exception while generating game: {stderr.decode()}')
+
+        except RetryError as e:
+            raise e.last_attempt._exception from e
+
+        return attempts
 
     @classmethod
     async def create(
             cls,
             settings,
             spoilers=True,
-            branch="stable"
+            branch="stable",
+            queue_callback=None
     ):
         seed = cls(settings=settings, spoilers=spoilers, branch=branch)
-        await seed.generate_game()
+        await seed.generate_game(queue_callback=queue_callback)
         return seed
 
     @property
@@ -1,13 +1,12 @@
-import aiohttp
-
 import config
+from alttprbot.util import http
 
 OOTR_BASE_URL = 'https://ootrandomizer.com'
 OOTR_API_KEY = config.OOTR_API_KEY
 
 
 async def roll_ootr(settings, version='6.1.0', encrypt=True):
-    async with aiohttp.request(
+    async with http.get_session(OOTR_BASE_URL).request(
             method='post',
             url=f"{OOTR_BASE_URL}/api/sglive/seed/create",
             raise_for_status=True,
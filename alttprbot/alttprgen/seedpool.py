@@ -0,0 +1,172 @@
+"""
+Optional pool of pre-generated ALTTPR seeds for high-demand presets.
+
+Pools are defined in config.SEED_POOLS, for example:
+
+    SEED_POOLS = [
+        {'preset': 'sglive2024', 'branch': 'live', 'size': 10, 'triforce_text_pool': 'sgl24'},
+    ]
+
+Each pool is keyed by (preset, branch, tournament).  A background task keeps the
+pool topped up with seeds that have not been handed out yet, and entry points
+claim one atomically, falling back to live generation when the pool is empty.
+
+Each pooled seed records a hash of the preset it was rolled from.  Once the preset
+changes, the seeds rolled from the old version are no longer handed out, and are
+replaced on the next refill.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from tortoise.expressions import Q
+
+import config
+from alttprbot import models
+from alttprbot.alttprgen import generator
+from alttprbot.util import triforce_text
+from alttprbot_discord.util.alttpr_discord import ALTTPRDiscord
+
+# how many times to retry a claim that lost a race with another claimant
+CLAIM_ATTEMPTS = 3
+
+
+@dataclass
+class SeedPoolDefinition:
+    preset: str
+    branch: str = None
+    tournament: bool = True
+    size: int = 5
+    hints: bool = False
+    spoilers: str = "off"
+    allow_quickswap: bool = True
+    triforce_text_pool: str = None
+
+    def matches(self, preset, branch, tournament, hints, spoilers, allow_quickswap) -> bool:
+        return (
+            self.preset == preset and
+            self.branch == branch and
+            self.tournament == tournament and
+            self.hints == hints and
+            self.spoilers == spoilers and
+            self.allow_quickswap == allow_quickswap
+        )
+
+
+SEED_POOLS: List[SeedPoolDefinition] = [SeedPoolDefinition(**p) for p in getattr(config, 'SEED_POOLS', [])]
+
+
+def find_pool(preset, branch=None, tournament=True, hints=False, spoilers="off",
+              allow_quickswap=True) -> Optional[SeedPoolDefinition]:
+    for pool in SEED_POOLS:
+        if pool.matches(preset, branch, tournament, hints, spoilers, allow_quickswap):
+            return pool
+    return None
+
+
+async def preset_hash(preset: str) -> str:
+    preset_data = (await generator.ALTTPRPreset(preset).fetch()).preset_data
+    return hashlib.sha256(json.dumps(preset_data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _pool_filter(pool: SeedPoolDefinition, *args, **kwargs):
+    return models.SeedPool.filter(
+        *args,
+        randomizer='alttpr',
+        preset=pool.preset,
+        branch=pool.branch,
+        tournament=pool.tournament,
+        claimed_at=None,
+        **kwargs,
+    )
+
+
+async def claim_alttpr(preset, branch=None, tournament=True, hints=False, spoilers="off",
+                       allow_quickswap=True) -> Optional[ALTTPRDiscord]:
+    """
+    Claims a pre-generated seed matching the request, or returns None if no pool matches or the pool is empty.
+    """
+    pool = find_pool(preset, branch, tournament, hints, spoilers, allow_quickswap)
+    if pool is None:
+        return None
+
+    current_hash = await preset_hash(pool.preset)
+
+    for _ in range(CLAIM_ATTEMPTS):
+        entry = await _pool_filter(pool, preset_hash=current_hash).order_by('id').first()
+        if entry is None:
+            logging.info("Seed pool for %s is empty, falling back to live generation.", preset)
+            return None
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+        # only one claimant can move claimed_at off of NULL, anyone else moves on to the next seed
+        claimed = await models.SeedPool.filter(id=entry.id, claimed_at=None).update(claimed_at=now)
+        if not claimed:
+            continue
+
+        await models.AuditGeneratedGames.filter(randomizer='alttpr', hash_id=entry.hash_id).update(handed_out_at=now)
+
+        parts = urlsplit(entry.permalink)
+        seed = await ALTTPRDiscord.retrieve(hash_id=entry.hash_id, baseurl=f"{parts.scheme}://{parts.netloc}")
+        logging.info("Claimed pooled seed %s for %s.", entry.hash_id, preset)
+        return seed
+
+    return None
+
+
+async def refill_pool(pool: SeedPoolDefinition) -> int:
+    current_hash = await preset_hash(pool.preset)
+
+    stale = await _pool_filter(pool, Q(preset_hash__not=current_hash) | Q(preset_hash=None)).delete()
+    if stale:
+        logging.info("Removed %s seeds rolled from an older version of %s from the seed pool.", stale, pool.preset)
+
+    available = await _pool_filter(pool, preset_hash=current_hash).count()
+    needed = pool.size - available
+
+    for _ in range(needed):
+        if pool.triforce_text_pool:
+            seed = await triforce_text.generate_with_triforce_text(
+                pool_name=pool.triforce_text_pool,
+                preset=pool.preset,
+                branch=pool.branch,
+                balanced=False,
+                handed_out=False,
+            )
+        else:
+            seed = await generator.ALTTPRPreset(pool.preset).generate(
+                hints=pool.hints,
+                spoilers=pool.spoilers,
+                tournament=pool.tournament,
+                allow_quickswap=pool.allow_quickswap,
+                branch=pool.branch,
+                handed_out=False,
+            )
+
+        await models.SeedPool.create(
+            randomizer='alttpr',
+            preset=pool.preset,
+            branch=pool.branch,
+            tournament=pool.tournament,
+            hash_id=seed.hash,
+            permalink=seed.url,
+            preset_hash=current_hash,
+        )
+
+    return max(needed, 0)
+
+
+async def refill_pools():
+    for pool in SEED_POOLS:
+        try:
+            added = await refill_pool(pool)
+            if added:
+                logging.info("Added %s seeds to the %s seed pool.", added, pool.preset)
+        except Exception:
+            logging.exception("Unable to refill the %s seed pool.", pool.preset)
@@ -28,11 +28,33 @@ class AuditGeneratedGames(Model):
     customizer = fields.IntField(null=True)
     doors = fields.BooleanField(default=False, null=False)
     avianart = fields.BooleanField(default=False, null=False)
+    handed_out_at = fields.DatetimeField(null=True)
+
+
+class SeedPool(Model):
+    class Meta:
+        table = "seed_pool"
+        indexes = (("randomizer", "preset", "branch", "tournament", "claimed_at"),)
+
+    id = fields.IntField(pk=True)
+    randomizer = fields.CharField(45)
+    preset = fields.CharField(100)
+    branch = fields.CharField(45, null=True)
+    tournament = fields.BooleanField()
+    hash_id = fields.CharField(50)
+    permalink = fields.CharField(2000)
+    preset_hash = fields.CharField(64, null=True)
+    created = fields.DatetimeField(auto_now_add=True)
+    claimed_at = fields.DatetimeField(null=True)
 
 
 class AuditMessages(Model):
     class Meta:
         table = "audit_messages"
+        indexes = (
+            ("message_date",),
+            ("guild_id", "message_date"),
+        )
 
     id = fields.IntField(pk=True)
     guild_id = fields.BigIntField(null=True)
@@ -362,8 +384,8 @@ class TournamentResults(Model):
         table = 'tournament_results'
 
     id = fields.IntField(pk=True)
-    srl_id = fields.CharField(45, null=True)
-    episode_id = fields.CharField(45, null=True)
+    srl_id = fields.CharField(45, null=True, index=True)
+    episode_id = fields.CharField(45, null=True, index=True)
     permalink = fields.CharField(1000, null=True)
     bingosync_room = fields.CharField(200, null=True)
     bingosync_password = fields.CharField(40, null=True)
@@ -491,6 +513,8 @@ class AsyncTournament(Model):
     active = fields.BooleanField(null=False, default=True)
     allowed_reattempts = fields.SmallIntField(null=False, default=0)
     runs_per_pool = fields.SmallIntField(null=False, default=1)
+    leaderboard_generation = fields.IntField(null=False, default=0)
+    leaderboard_updated_at = fields.DatetimeField(null=True)
 
     customization = fields.CharField(45, null=False, default='default')
 
@@ -614,12 +638,55 @@ class AsyncTournamentReviewNotes(Model):
     note = fields.TextField(null=False)
 
 
+class AsyncTournamentLeaderboardEntry(Model):
+    """
+    A row of the persisted leaderboard snapshot, written at the end of each score calculation.
+    Only rows matching AsyncTournament.leaderboard_generation are current.
+    """
+
+    class Meta:
+        indexes = (
+            ("tournament_id", "generation", "rank"),
+            ("tournament_id", "generation", "estimate_rank"),
+        )
+
+    id = fields.IntField(pk=True)
+    tournament = fields.ForeignKeyField('models.AsyncTournament', related_name='leaderboard_entries')
+    generation = fields.IntField(null=False)
+    user = fields.ForeignKeyField('models.Users', related_name='async_tournament_leaderboard_entries')
+    rank = fields.IntField(null=False)
+    estimate_rank = fields.IntField(null=False)
+    score = fields.FloatField(null=False)
+    estimate = fields.FloatField(null=False)
+    finished_race_count = fields.SmallIntField(null=False)
+    forfeited_race_count = fields.SmallIntField(null=False)
+    unattempted_race_count = fields.SmallIntField(null=False)
+    races = fields.JSONField(null=False)  # one slot per pool run, None if unplayed
+
+    class PydanticMeta:
+        exclude = ['tournament']
+
+    @property
+    def score_formatted(self) -> str:
+        return f"{self.score:.3f}"
+
+    @property
+    def estimate_formatted(self) -> str:
+        return f"{self.estimate:.3f}"
+
+
 class AsyncTournamentRace(Model):
+    class Meta:
+        indexes = (
+            ("tournament_id", "user_id", "status"),
+            ("permalink_id", "status", "reattempted"),
+        )
+
     id = fields.IntField(pk=True)
     tournament = fields.ForeignKeyField('models.AsyncTournament', related_name='races')
     permalink = fields.ForeignKeyField('models.AsyncTournamentPermalink', related_name='races')
     user = fields.ForeignKeyField('models.Users', related_name='async_tournament_races', null=False)
-    thread_id = fields.BigIntField(null=True)  # only set if run async in discord
+    thread_id = fields.BigIntField(null=True, index=True)  # only set if run async in discord
     thread_open_time = fields.DatetimeField(null=True)  # only set if run async in discord
     thread_timeout_time = fields.DatetimeField(null=True)
     start_time = fields.DatetimeField(null=True)
@@ -792,6 +859,31 @@ class VerifiedRacer(Model):
     created = fields.DatetimeField(auto_now_add=True)
     last_verified = fields.DatetimeField(null=True)
 
+
+class RacetimeRaceHistory(Model):
+    class Meta:
+        table = "racetime_race_history"
+        unique_together = ('rtgg_id', 'race_name')
+        indexes = (("rtgg_id", "category", "status", "opened_at"),)
+
+    id = fields.IntField(pk=True)
+    rtgg_id = fields.CharField(200, null=False)
+    race_name = fields.CharField(200, null=False)  # category/room-name
+    category = fields.CharField(50, null=False)
+    status = fields.CharField(45, null=False)
+    opened_at = fields.DatetimeField(null=False)
+
+
+class RacetimeRaceHistorySync(Model):
+    class Meta:
+        table = "racetime_race_history_sync"
+
+    id = fields.IntField(pk=True)
+    rtgg_id = fields.CharField(200, null=False, unique=True)
+    last_synced_at = fields.DatetimeField(null=False)
+    synced_since = fields.DatetimeField(null=False)  # races opened before this have not been mirrored
+
+
 class SGL2023OnsiteHistory(Model):
     id = fields.IntField(pk=True)
     date = fields.DatetimeField(auto_now_add=True)
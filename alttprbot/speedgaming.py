@@ -4,13 +4,13 @@ from datetime import datetime, timedelta
 from typing import List
 
 import aiofiles
-import aiohttp
 import pytz
 from dataclasses_json import LetterCase, dataclass_json, config
 from marshmallow import fields
 
 import config
 from alttprbot.exceptions import SahasrahBotException
+from alttprbot.util import http
 
 
 class SGEpisodeNotFoundException(SahasrahBotException):
@@ -129,7 +129,7 @@ async def get_upcoming_episodes_by_event(event, hours_past=4, hours_future=4):
         'from': sched_from.isoformat(),
         'to': sched_to.isoformat()
     }
-    async with aiohttp.request(
+    async with http.get_session(config.SG_API_ENDPOINT).request(
             method='get',
             url=f'{config.SG_API_ENDPOINT}/schedule',
             params=params,
@@ -160,14 +160,14 @@ async def get_episode(episodeid: int, complete=False):
         elif episodeid == 0:
             result = {"error": "Failed to find episode with id 0."}
         else:
-            async with aiohttp.request(
+            async with http.get_session(config.SG_API_ENDPOINT).request(
                     method='get',
                     url=f'{config.SG_API_ENDPOINT}/episode',
                     params={'id': episodeid},
             ) as resp:
                 result = await resp.text()
     else:
-        async with aiohttp.request(
+        async with http.get_session(config.SG_API_ENDPOINT).request(
                 method='get',
                 url=f'{config.SG_API_ENDPOINT}/episode',
                 params={'id': episodeid},
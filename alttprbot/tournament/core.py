@@ -1,5 +1,7 @@
 import logging
+import time
 from dataclasses import dataclass
+from typing import Dict, Set, Tuple
 
 import dateutil.parser
 import discord
@@ -15,6 +17,9 @@ from alttprbot_racetime.core import SahasrahBotRaceTimeBot
 
 APP_URL = config.APP_URL
 
+# how long a gatekeeper lookup for a racetime user is trusted, this is shared by every update in a race room
+GATEKEEP_CACHE_TTL = 300
+
 
 class UnableToLookupUserException(SahasrahBotException):
     pass
@@ -114,6 +119,7 @@ class TournamentRace(object):
         self.data: TournamentConfig = None
 
         self.rtgg_bot = None
+        self._gatekeep_cache: Dict[str, Tuple[bool, float]] = {}
         self.restream_team = None
 
     @classmethod
@@ -270,11 +276,33 @@ class TournamentRace(object):
 
         return looked_up_player
 
+    @property
+    def restream_team(self):
+        return self._restream_team
+
+    @restream_team.setter
+    def restream_team(self, team):
+        self._restream_team = team
+        self.restream_team_ids: Set[str] = {m['id'] for m in team['members']} if team else set()
+        self._gatekeep_cache.clear()
+
     async def can_gatekeep(self, rtgg_id):
-        team_member_ids = [m['id'] for m in self.restream_team['members']]
-        if rtgg_id in team_member_ids:
+        """
+        Returns True if the racetime user is on the restream team or has one of the helper roles.  Answers are cached
+        for GATEKEEP_CACHE_TTL seconds, since this gets asked on every room update while an entrant is waiting.
+        """
+        if rtgg_id in self.restream_team_ids:
             return True
 
+        cached = self._gatekeep_cache.get(rtgg_id)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+
+        authorized = await self._resolve_gatekeeper(rtgg_id)
+        self._gatekeep_cache[rtgg_id] = (authorized, time.monotonic() + GATEKEEP_CACHE_TTL)
+        return authorized
+
+    async def _resolve_gatekeeper(self, rtgg_id):
         nickname = await models.Users.get_or_none(rtgg_id=rtgg_id)
 
         if not nickname:
@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import json
 import logging
@@ -8,11 +9,12 @@ import gspread_asyncio
 import isodate
 import pytz
 from bs4 import BeautifulSoup
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential
 
 import config
 from alttprbot import models
 from alttprbot.tournament import test, boots, dailies, smwde, smrl_playoff, nologic, alttprhmg, alttprleague, alttprmini, alttprde, alttprsglive, alttpr
-from alttprbot.util import gsheet
+from alttprbot.util import gsheet, http
 from alttprbot_racetime import bot as racetimebot
 
 RACETIME_URL = config.RACETIME_URL
@@ -20,6 +22,9 @@ RACETIME_URL = config.RACETIME_URL
 RACETIME_SESSION_TOKEN = config.RACETIME_SESSION_TOKEN
 RACETIME_CSRF_TOKEN = config.RACETIME_CSRF_TOKEN
 
+RACE_DATA_FETCH_CONCURRENCY = 5
+GSHEET_RETRY_ATTEMPTS = 5
+
 if config.DEBUG:
     TOURNAMENT_DATA = {
         'test': test.TestTournament
@@ -66,8 +71,8 @@ async def create_tournament_race_room(event, episodeid):
     rtgg_bot = racetimebot.racetime_bots[event_data.data.racetime_category]
     race = await models.TournamentResults.get_or_none(episode_id=episodeid)
     if race:
-        async with aiohttp.request(method='get', url=rtgg_bot.http_uri(f"/{race.srl_id}/data"),
-                                   raise_for_status=True) as resp:
+        url = rtgg_bot.http_uri(f"/{race.srl_id}/data")
+        async with http.get_session(url).request(method='get', url=url, raise_for_status=True) as resp:
             race_data = json.loads(await resp.read())
         status = race_data.get('status', {}).get('value')
         if not status == 'cancelled':
@@ -83,83 +88,140 @@ async def race_recording_task():
     agc = await agcm.authorize()
 
     for event, event_obj in TOURNAMENT_DATA.items():
-        event_data = await event_obj.get_config()
-        if event_data.data.gsheet_id is None:
-            continue
+        try:
+            await record_event_races(agc, event, event_obj)
+        except Exception:
+            logging.exception(f"Encountered a problem when attempting to record races for {event}.")
 
-        wb = await agc.open_by_key(event_data.data.gsheet_id)
+    logging.debug('done')
+
+
+async def record_event_races(agc, event, event_obj):
+    event_data = await event_obj.get_config()
+    if event_data.data.gsheet_id is None:
+        return
 
-        races = await models.TournamentResults.filter(written_to_gsheet=None, event=event)
+    races = await models.TournamentResults.filter(written_to_gsheet=None, event=event)
+
+    if not races:
+        return
+
+    wb = await agc.open_by_key(event_data.data.gsheet_id)
+
+    try:
+        wks = await wb.worksheet(event)
+    except gspread.exceptions.WorksheetNotFound:
+        wks = await wb.add_worksheet(event, 50, 10)
+        await wks.append_row(values=[
+            'episode',
+            'start time (eastern)',
+            'racetime',
+            'winner',
+            'loser',
+            'winner finish',
+            'loser finish',
+            'permalink',
+            'spoiler',
+        ])
+
+    semaphore = asyncio.Semaphore(RACE_DATA_FETCH_CONCURRENCY)
+
+    async def fetch_race_data(race):
+        async with semaphore:
+            async with http.get_session(RACETIME_URL).request(
+                    method='get',
+                    url=f"{RACETIME_URL}/{race.srl_id}/data",
+                    raise_for_status=True) as resp:
+                return json.loads(await resp.read())
+
+    results = await asyncio.gather(*[fetch_race_data(race) for race in races], return_exceptions=True)
+
+    rows = []
+    recorded = []
+    cancelled_ids = []
+    for race, race_data in zip(races, results):
+        if isinstance(race_data, Exception):
+            logging.error(f"Unable to retrieve race data for {race.srl_id}: {race_data}")
+            continue
+
+        if race_data['status']['value'] == 'cancelled':
+            cancelled_ids.append(race.id)
+            continue
 
-        if not races:
+        if race_data['status']['value'] != 'finished':
             continue
 
         try:
-            wks = await wb.worksheet(event)
-        except gspread.exceptions.WorksheetNotFound:
-            wks = await wb.add_worksheet(event, 50, 10)
-            await wks.append_row(values=[
-                'episode',
-                'start time (eastern)',
-                'racetime',
-                'winner',
-                'loser',
-                'winner finish',
-                'loser finish',
-                'permalink',
-                'spoiler',
-            ])
-
-        for race in races:
-            logging.info(f"Recording {race.episode_id} for {event} to {event_data.data.gsheet_id}")
-            try:
-                async with aiohttp.request(
-                        method='get',
-                        url=f"{RACETIME_URL}/{race.srl_id}/data",
-                        raise_for_status=True) as resp:
-                    race_data = json.loads(await resp.read())
-
-                if race_data['status']['value'] == 'finished':
-                    winner = [e for e in race_data['entrants'] if e['place'] == 1][
-                        0]  # pylint: disable=used-before-assignment
-                    runnerup = [e for e in race_data['entrants'] if e['place'] in [2, None]][
-                        0]  # pylint: disable=used-before-assignment
-
-                    started_at = isodate.parse_datetime(race_data['started_at']).astimezone(pytz.timezone('US/Eastern'))
-                    ended_at = isodate.parse_datetime(race_data['ended_at'])
-                    record_at = ended_at + datetime.timedelta(minutes=event_data.data.stream_delay)
-
-                    if record_at > datetime.datetime.now(tz=datetime.timezone.utc):
-                        continue
-
-                    await wks.append_row(values=[
-                        race.episode_id,
-                        started_at.strftime("%Y-%m-%d %H:%M:%S"),
-                        f"{RACETIME_URL}/{race.srl_id}",
-                        winner['user']['name'],
-                        runnerup['user']['name'],
-                        str(isodate.parse_duration(winner['finish_time'])) if isinstance(winner['finish_time'],
-                                                                                         str) else None,
-                        str(isodate.parse_duration(runnerup['finish_time'])) if isinstance(runnerup['finish_time'],
-                                                                                           str) else None,
-                        race.permalink,
-                        race.spoiler
-                    ])
-                    race.status = "RECORDED"
-                    race.written_to_gsheet = 1
-                    await race.save()
-
-                    if event_data.data.auto_record:
-                        await racetime_auto_record(race_data)
-
-                elif race_data['status']['value'] == 'cancelled':
-                    await race.delete()
-                else:
-                    continue
-            except Exception as e:
-                logging.exception("Encountered a problem when attempting to record a race.")
+            row = build_race_result_row(race, race_data, event_data.data.stream_delay)
+        except Exception:
+            logging.exception("Encountered a problem when attempting to record a race.")
+            continue
 
-    logging.debug('done')
+        if row is None:
+            continue
+
+        rows.append(row)
+        recorded.append((race, race_data))
+
+    if cancelled_ids:
+        await models.TournamentResults.filter(id__in=cancelled_ids).delete()
+
+    if not rows:
+        return
+
+    logging.info(f"Recording {len(rows)} races for {event} to {event_data.data.gsheet_id}")
+
+    # if this fails, the races stay unwritten and are picked up again on the next run
+    async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(GSHEET_RETRY_ATTEMPTS),
+            wait=wait_exponential(multiplier=2, max=60),
+            retry=retry_if_exception(is_gsheet_quota_error),
+            reraise=True):
+        with attempt:
+            await wks.append_rows(values=rows)
+
+    await models.TournamentResults.filter(id__in=[race.id for race, _ in recorded]).update(
+        status="RECORDED",
+        written_to_gsheet=1
+    )
+
+    if event_data.data.auto_record:
+        for race, race_data in recorded:
+            try:
+                await racetime_auto_record(race_data)
+            except Exception:
+                logging.exception(f"Unable to automatically record {race.srl_id}.")
+
+
+def build_race_result_row(race: models.TournamentResults, race_data: dict, stream_delay: int):
+    """
+    Builds the spreadsheet row for a finished race, or returns None if the race is still within the stream delay.
+    """
+    winner = [e for e in race_data['entrants'] if e['place'] == 1][0]
+    runnerup = [e for e in race_data['entrants'] if e['place'] in [2, None]][0]
+
+    started_at = isodate.parse_datetime(race_data['started_at']).astimezone(pytz.timezone('US/Eastern'))
+    ended_at = isodate.parse_datetime(race_data['ended_at'])
+    record_at = ended_at + datetime.timedelta(minutes=stream_delay)
+
+    if record_at > datetime.datetime.now(tz=datetime.timezone.utc):
+        return None
+
+    return [
+        race.episode_id,
+        started_at.strftime("%Y-%m-%d %H:%M:%S"),
+        f"{RACETIME_URL}/{race.srl_id}",
+        winner['user']['name'],
+        runnerup['user']['name'],
+        str(isodate.parse_duration(winner['finish_time'])) if isinstance(winner['finish_time'], str) else None,
+        str(isodate.parse_duration(runnerup['finish_time'])) if isinstance(runnerup['finish_time'], str) else None,
+        race.permalink,
+        race.spoiler
+    ]
+
+
+def is_gsheet_quota_error(e: BaseException) -> bool:
+    return isinstance(e, gspread.exceptions.APIError) and e.response.status_code == 429
 
 
 async def racetime_auto_record(race_data):
@@ -1,12 +1,12 @@
 import asyncio
 import logging
 import random
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import timedelta
 from functools import cached_property
-from typing import List
+from typing import Dict, List, Set
 
-import aiocache
 import discord
 from tortoise.exceptions import MultipleObjectsReturned
 from tortoise.functions import Count
@@ -18,30 +18,59 @@ from alttprbot import models
 QUALIFIER_MAX_SCORE = 105
 QUALIFIER_MIN_SCORE = 0
 MAX_POOL_IMBALANCE = 3
-
-CACHE = aiocache.Cache(aiocache.SimpleMemoryCache)
+SCORE_UPDATE_BATCH_SIZE = 500
 
 score_calculation_lock = asyncio.Lock()
 
+# permalink IDs, keyed by tournament ID, with races that changed since their scores were last calculated
+DIRTY_PERMALINKS: Dict[int, Set[int]] = defaultdict(set)
+
 
-async def calculate_async_tournament(tournament: models.AsyncTournament, only_approved: bool = False, cache=True):
+async def calculate_async_tournament(tournament: models.AsyncTournament, only_approved: bool = False,
+                                     update_leaderboard: bool = True, only_dirty: bool = False):
     """
     Iterates through each permalink for a tournament and calculates the par time for each one.
     This is intended to be run as a background task.
 
     If only_approved is True, only approved runs will be used to calculate the par time.
 
+    If only_dirty is True, only permalinks flagged by mark_permalink_dirty since the last run are recalculated.
+    This is a no-op if nothing has changed.
+
+    If update_leaderboard is True, a new leaderboard snapshot is written once scoring is done.
+
     This function is thread-safe.
     """
 
     async with score_calculation_lock:
-        await tournament.fetch_related("permalink_pools", "permalink_pools__permalinks")
-        for pool in tournament.permalink_pools:
-            for permalink in pool.permalinks:
+        if only_dirty:
+            permalink_ids = DIRTY_PERMALINKS.pop(tournament.id, set())
+            if not permalink_ids:
+                return
+            permalinks = await models.AsyncTournamentPermalink.filter(id__in=permalink_ids)
+        else:
+            DIRTY_PERMALINKS.pop(tournament.id, None)
+            await tournament.fetch_related("permalink_pools", "permalink_pools__permalinks")
+            permalinks = [permalink for pool in tournament.permalink_pools for permalink in pool.permalinks]
+
+        for idx, permalink in enumerate(permalinks):
+            try:
                 await calculate_permalink_par(permalink, only_approved=only_approved)
+            except Exception:
+                # put anything we didn't get to back in the queue so the next run picks it up
+                DIRTY_PERMALINKS[tournament.id].update(p.id for p in permalinks[idx:])
+                raise
+
+        if update_leaderboard:
+            await write_leaderboard_snapshot(tournament)
+
 
-    if cache:
-        await CACHE.delete(f'async_leaderboard_{tournament.id}')
+def mark_permalink_dirty(race: models.AsyncTournamentRace):
+    """
+    Flags the permalink of a race as needing its par time and scores recalculated.
+    Call this whenever a race is finished, forfeited, reviewed, or otherwise changed in a way that affects scoring.
+    """
+    DIRTY_PERMALINKS[race.tournament_id].add(race.permalink_id)
 
 
 async def calculate_permalink_par(permalink: models.AsyncTournamentPermalink, only_approved: bool = False) -> bool:
@@ -83,11 +112,14 @@ async def calculate_permalink_par(permalink: models.AsyncTournamentPermalink, on
     permalink.par_updated_at = discord.utils.utcnow()
     await permalink.save()
 
+    score_updated_at = discord.utils.utcnow()
     for race in races:
         race.score = calculate_qualifier_score(par_time=par_time,
                                                elapsed_time=race.elapsed_time) if race.status == "finished" else 0
-        race.score_updated_at = discord.utils.utcnow()
-        await race.save(update_fields=["score", "score_updated_at"])
+        race.score_updated_at = score_updated_at
+
+    await models.AsyncTournamentRace.bulk_update(races, fields=["score", "score_updated_at"],
+                                                 batch_size=SCORE_UPDATE_BATCH_SIZE)
 
     return True
 
@@ -169,7 +201,7 @@ async def populate_test_data(tournament: models.AsyncTournament, participant_cou
     for i in range(1, participant_count + 1):
         # create a fake user, set a test_user flag to true so we can delete them later if needed
         user = await models.Users.create(
-            discord_id=i + offset,
+            discord_user_id=i + offset,
             display_name=f"Test User {i + offset}",
             test_user=True
         )
@@ -257,54 +289,126 @@ class LeaderboardEntry:
         return len([r for r in self.races if r is not None and r.status in ["forfeit", "disqualified"]])
 
 
-# TODO: this is an inefficient way to calculate the leaderboard, but it's the only way I can think of right now
-async def get_leaderboard(tournament: models.AsyncTournament, cache: bool = True):
+async def get_leaderboard(tournament: models.AsyncTournament, offset: int = 0, limit: int = None,
+                          sort: str = "score") -> List[models.AsyncTournamentLeaderboardEntry]:
     """
-    Returns a leaderboard for the specified tournament.
-    The leaderboard is a list of LeaderboardEntry objects, sorted by score.
-    The pools are a list of the permalink pools for the tournament.
-    This return of this coroutine is cached until scores are calculated.
+    Returns a page of the persisted leaderboard snapshot for the specified tournament, ordered by rank.
+    Set sort to "estimate" to order by estimate instead of score.
+
+    A snapshot is written the first time a tournament's leaderboard is requested, after that it is only
+    rewritten when scores are calculated.
     """
-    key = f'async_leaderboard_{tournament.id}'
-    if await CACHE.exists(key) and cache:
-        leaderboard = await CACHE.get(key)
-        return leaderboard
+    if tournament.leaderboard_generation == 0:
+        async with score_calculation_lock:
+            await tournament.refresh_from_db(fields=["leaderboard_generation", "leaderboard_updated_at"])
+            if tournament.leaderboard_generation == 0:
+                await write_leaderboard_snapshot(tournament)
 
-    async with score_calculation_lock:
-        # get a list of all user IDs who have participated in the tournament
-        logging.info("Building leaderboard for tournament %s", tournament.id)
-        user_ids = await tournament.races.all().distinct().values("user_id")
-        user_id_list = [p['user_id'] for p in user_ids]
-
-        # get a list of all permalink pools for the tournament
-        await tournament.fetch_related("permalink_pools")
-
-        leaderboard: List[LeaderboardEntry] = []
-        for user_id in user_id_list:
-            rs = []
-            for pool in tournament.permalink_pools:
-                races = await models.AsyncTournamentRace.filter(
-                    user_id=user_id,
-                    tournament=tournament,
-                    permalink__pool=pool,
-                    status__in=["finished", "forfeit", "disqualified"],
-                    reattempted=False
-                )
-                for i in range(tournament.runs_per_pool):
-                    try:
-                        race = races[i]
-                    except IndexError:
-                        race = None
-                    rs.append(race)
-
-            entry = LeaderboardEntry(
-                player=await models.Users.get(id=user_id),
-                races=rs
-            )
-            leaderboard.append(entry)
+    rank_field = "estimate_rank" if sort == "estimate" else "rank"
+    qs = models.AsyncTournamentLeaderboardEntry.filter(
+        tournament_id=tournament.id,
+        generation=tournament.leaderboard_generation,
+        **{f"{rank_field}__gt": offset},
+    ).order_by(rank_field).prefetch_related('user')
+    if limit is not None:
+        qs = qs.filter(**{f"{rank_field}__lte": offset + limit})
+
+    return await qs
+
+
+async def write_leaderboard_snapshot(tournament: models.AsyncTournament):
+    """
+    Builds the leaderboard and persists it as a new generation, then removes the ones before the previous one.
+    Readers keep seeing the old generation until the tournament's leaderboard_generation is bumped, and the previous
+    generation is kept around until the next snapshot so requests that already read the old number can still finish.
+
+    This does not acquire the score calculation lock, callers are expected to do so.
+    """
+    logging.info("Building leaderboard for tournament %s", tournament.id)
+    leaderboard = await build_leaderboard(tournament)
+
+    generation = tournament.leaderboard_generation + 1
+    estimate_ranks = {
+        id(entry): idx + 1
+        for idx, entry in enumerate(sorted(leaderboard, key=lambda e: e.estimate, reverse=True))
+    }
+
+    await models.AsyncTournamentLeaderboardEntry.bulk_create([
+        models.AsyncTournamentLeaderboardEntry(
+            tournament_id=tournament.id,
+            generation=generation,
+            user_id=entry.player.id,
+            rank=idx + 1,
+            estimate_rank=estimate_ranks[id(entry)],
+            score=entry.score,
+            estimate=entry.estimate,
+            finished_race_count=entry.finished_race_count,
+            forfeited_race_count=entry.forfeited_race_count,
+            unattempted_race_count=entry.unattempted_race_count,
+            races=[
+                {
+                    'id': race.id,
+                    'permalink_id': race.permalink_id,
+                    'start_time': race.start_time.isoformat() if race.start_time else None,
+                    'end_time': race.end_time.isoformat() if race.end_time else None,
+                    'score': race.score,
+                    'score_formatted': race.score_formatted,
+                    'elapsed_time': race.elapsed_time_formatted,
+                    'status': race.status,
+                } if race else None
+                for race in entry.races
+            ],
+        )
+        for idx, entry in enumerate(leaderboard)
+    ], batch_size=SCORE_UPDATE_BATCH_SIZE)
+
+    tournament.leaderboard_generation = generation
+    tournament.leaderboard_updated_at = discord.utils.utcnow()
+    await tournament.save(update_fields=["leaderboard_generation", "leaderboard_updated_at"])
+
+    await models.AsyncTournamentLeaderboardEntry.filter(tournament_id=tournament.id,
+                                                        generation__lt=generation - 1).delete()
+    logging.info("Leaderboard generation %s written for tournament %s", generation, tournament.id)
+
+
+async def build_leaderboard(tournament: models.AsyncTournament) -> List[LeaderboardEntry]:
+    """
+    Builds the leaderboard for a tournament using a fixed number of queries, regardless of the number of players.
+    All scored races for the tournament are loaded at once and grouped in memory by player and pool.
+
+    This does not acquire the score calculation lock, callers are expected to do so.
+    """
+    await tournament.fetch_related("permalink_pools")
+    pool_ids = [pool.id for pool in tournament.permalink_pools]
+
+    # map each permalink to its pool, so we don't need to join on every race
+    permalink_pools = dict(
+        await models.AsyncTournamentPermalink.filter(pool_id__in=pool_ids).values_list("id", "pool_id")
+    )
+
+    # every user who has participated in the tournament gets an entry, even if they have no scored races
+    user_id_list = await tournament.races.all().distinct().values_list("user_id", flat=True)
+    players = {u.id: u for u in await models.Users.filter(id__in=user_id_list)}
+
+    races = await models.AsyncTournamentRace.filter(
+        tournament=tournament,
+        status__in=["finished", "forfeit", "disqualified"],
+        reattempted=False
+    ).order_by("id")
+
+    # group races by (user_id, pool_id), preserving the order they were played in
+    grouped = defaultdict(list)
+    for race in races:
+        grouped[(race.user_id, permalink_pools.get(race.permalink_id))].append(race)
+
+    leaderboard: List[LeaderboardEntry] = []
+    for user_id in user_id_list:
+        rs = []
+        for pool_id in pool_ids:
+            pool_races = grouped.get((user_id, pool_id), [])[:tournament.runs_per_pool]
+            rs.extend(pool_races + [None] * (tournament.runs_per_pool - len(pool_races)))
 
-        leaderboard.sort(key=lambda e: e.score, reverse=True)
+        leaderboard.append(LeaderboardEntry(player=players[user_id], races=rs))
 
-    logging.info("Leaderboard built for tournament %s", tournament.id)
-    await CACHE.set(key, leaderboard)
+    leaderboard.sort(key=lambda e: e.score, reverse=True)
     return leaderboard
@@ -0,0 +1,73 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+
+class DeadlineScheduler:
+    """
+    A timer heap that awaits callback(key) once a key's deadline passes.
+
+    Each key has at most one deadline.  Scheduling a key again replaces its deadline and cancelling it removes it,
+    the old heap entries are just skipped when they come up.
+    """
+
+    def __init__(self, callback: Callable[[Hashable], Awaitable[Any]] = None):
+        self.callback = callback
+        self._heap: List[Tuple[datetime.datetime, int, Hashable]] = []
+        self._deadlines: Dict[Hashable, datetime.datetime] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task = None
+
+    def schedule(self, key: Hashable, when: datetime.datetime):
+        self._deadlines[key] = when
+        heapq.heappush(self._heap, (when, next(self._counter), key))
+        self._wakeup.set()
+
+    def cancel(self, key: Hashable):
+        self._deadlines.pop(key, None)
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def _discard_stale(self):
+        while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    async def _run(self):
+        while True:
+            self._discard_stale()
+            self._wakeup.clear()
+
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            when, _, key = self._heap[0]
+            delay = (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+            if delay > 0:
+                # sleep until the earliest deadline, or until something new gets scheduled
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            del self._deadlines[key]
+            try:
+                await self.callback(key)
+            except Exception:
+                logging.exception("Exception while handling deadline for %s", key)
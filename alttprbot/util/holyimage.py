@@ -1,11 +1,11 @@
 import json
 from urllib.parse import urljoin
 
-import aiohttp
 import discord
 import html2markdown
 
 from alttprbot.exceptions import SahasrahBotException
+from alttprbot.util import http
 
 
 async def holy(slug, game='z3r'):
@@ -71,8 +71,7 @@ class HolyImage():
 
 
 async def get_json(url):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            text = await resp.read()
+    async with http.get_session(url).get(url) as resp:
+        text = await resp.read()
 
     return json.loads(text)
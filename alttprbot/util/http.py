@@ -1,43 +1,108 @@
 import json
+import logging
+from collections import defaultdict
+from typing import Dict
+from urllib.parse import urlsplit
 
 import aiohttp
 import yaml
 
+# per-host connection pool settings, shared by every outbound request made through get_session()
+CONNECTION_LIMIT_PER_HOST = 20
+KEEPALIVE_TIMEOUT = 30
+DNS_CACHE_TTL = 300
+# the same as aiohttp's own default, some seed generators take minutes to respond
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=300, sock_connect=30)
 
-async def request_generic(url, method='get', reqparams=None, data=None, header=None, auth=None, returntype='text'):
-    async with aiohttp.ClientSession(auth=None, raise_for_status=True) as session:
-        async with session.request(method.upper(), url, params=reqparams, data=data, headers=header, auth=auth) as resp:
-            if returntype == 'text':
-                return await resp.text()
-            elif returntype == 'json':
-                return json.loads(await resp.text())
-            elif returntype == 'binary':
-                return await resp.read()
-            elif returntype == 'yaml':
-                return yaml.safe_load(await resp.read())
+# one pooled session per upstream host, created on first use
+_sessions: Dict[str, aiohttp.ClientSession] = {}
+
+# per-host counters, useful for confirming that connections are actually being reused
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {'requests': 0, 'connections_created': 0, 'connections_reused': 0})
+
+
+def _trace_config(host: str) -> aiohttp.TraceConfig:
+    async def on_request_start(session, ctx, params):
+        _stats[host]['requests'] += 1
+
+    async def on_connection_create_end(session, ctx, params):
+        _stats[host]['connections_created'] += 1
+
+    async def on_connection_reuseconn(session, ctx, params):
+        _stats[host]['connections_reused'] += 1
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    return trace_config
+
+
+def get_session(url: str) -> aiohttp.ClientSession:
+    """
+    Returns the shared, pooled session for the host of the given url, creating it if needed.
+    Callers must not close the returned session, use close_sessions() at shutdown instead.
+
+    The session doesn't keep cookies, since it's shared by unrelated callers.  Pass cookies per request if needed.
+    """
+    host = urlsplit(url).netloc.lower()
+    session = _sessions.get(host)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit_per_host=CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=DEFAULT_TIMEOUT,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            trace_configs=[_trace_config(host)],
+        )
+        _sessions[host] = session
+    return session
+
+
+def get_connection_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Returns request and connection counters for each upstream host.
+    """
+    return {host: dict(stats) for host, stats in _stats.items()}
+
+
+async def close_sessions():
+    """
+    Closes every pooled session.  This should be called once when the application shuts down.
+    """
+    for host, session in list(_sessions.items()):
+        logging.info("Closing HTTP session for %s: %s", host, _stats[host])
+        await session.close()
+    _sessions.clear()
+
+
+async def _read_response(resp: aiohttp.ClientResponse, returntype: str):
+    if returntype == 'text':
+        return await resp.text()
+    elif returntype == 'json':
+        return json.loads(await resp.text())
+    elif returntype == 'binary':
+        return await resp.read()
+    elif returntype == 'yaml':
+        return yaml.safe_load(await resp.read())
+
+
+async def request_generic(url, method='get', reqparams=None, data=None, header=None, auth=None, returntype='text',
+                          timeout=None):
+    async with get_session(url).request(method.upper(), url, params=reqparams, data=data, headers=header, auth=auth,
+                                        timeout=timeout or DEFAULT_TIMEOUT, raise_for_status=True) as resp:
+        return await _read_response(resp, returntype)
 
 
 async def request_json_post(url, data, auth=None, returntype='text'):
-    async with aiohttp.ClientSession(auth=auth, raise_for_status=True) as session:
-        async with session.post(url=url, json=data, auth=auth) as resp:
-            if returntype == 'text':
-                return await resp.text()
-            elif returntype == 'json':
-                return json.loads(await resp.text())
-            elif returntype == 'binary':
-                return await resp.read()
-            elif returntype == 'yaml':
-                return yaml.safe_load(await resp.read())
+    async with get_session(url).post(url=url, json=data, auth=auth, raise_for_status=True) as resp:
+        return await _read_response(resp, returntype)
 
 
 async def request_json_put(url, data, auth=None, returntype='text'):
-    async with aiohttp.ClientSession(auth=auth, raise_for_status=True) as session:
-        async with session.put(url=url, json=data, auth=auth) as resp:
-            if returntype == 'text':
-                return await resp.text()
-            elif returntype == 'json':
-                return json.loads(await resp.text())
-            elif returntype == 'binary':
-                return await resp.read()
-            elif returntype == 'yaml':
-                return yaml.safe_load(await resp.read())
+    async with get_session(url).put(url=url, json=data, auth=auth, raise_for_status=True) as resp:
+        return await _read_response(resp, returntype)
@@ -0,0 +1,181 @@
+"""
+A local mirror of each racetime.gg user's race history, used for racer verification.
+
+racetime.gg lists a user's races newest first, so after the first sync only the pages newer than the last sync need to
+be fetched.  Races that were still open at the last sync are fetched again so their status gets updated.
+"""
+
+import asyncio
+import datetime
+import logging
+from typing import Dict, List, Optional, Set
+
+import isodate
+import pytz
+
+import config
+from alttprbot import models
+from alttprbot.util import http
+
+RACETIME_URL = config.RACETIME_URL
+
+# races in these states won't change anymore
+FINAL_STATUSES = ['finished', 'cancelled']
+
+# don't go back to racetime.gg for a user more often than this
+SYNC_INTERVAL = datetime.timedelta(minutes=getattr(config, 'RACETIME_HISTORY_SYNC_MINUTES', 10))
+
+# how many race history pages may be requested from racetime.gg at once, across all users
+RACETIME_HISTORY_CONCURRENCY = getattr(config, 'RACETIME_HISTORY_CONCURRENCY', 4)
+
+_request_semaphore = asyncio.Semaphore(RACETIME_HISTORY_CONCURRENCY)
+_sync_locks: Dict[str, asyncio.Lock] = {}
+_backfill_tasks: Set[asyncio.Task] = set()
+
+
+def _aware(dt: datetime.datetime) -> datetime.datetime:
+    if dt.tzinfo is None:
+        return pytz.utc.localize(dt)
+    return dt
+
+
+async def _fetch_page(rtgg_id: str, page: int) -> dict:
+    async with _request_semaphore:
+        async with http.get_session(RACETIME_URL).request(
+                method='get',
+                url=f'{RACETIME_URL}/user/{rtgg_id}/races/data',
+                params={'page': page},
+                raise_for_status=True
+        ) as resp:
+            return await resp.json()
+
+
+async def sync_user(rtgg_id: str, days: int = 365, category_slugs: List[str] = None, enough: Optional[int] = None):
+    """
+    Brings the mirror for a user up to date, making sure it covers at least the last number of days.
+
+    If any page can't be fetched this raises before the sync is recorded, so the next sync covers the same window again.
+
+    When enough is given, a first sync stops paging once that many finished races in category_slugs have been seen.
+    The rest of the window is then backfilled in the background.
+    """
+    lock = _sync_locks.setdefault(rtgg_id, asyncio.Lock())
+    async with lock:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        since = now - datetime.timedelta(days=days)
+
+        sync = await models.RacetimeRaceHistorySync.get_or_none(rtgg_id=rtgg_id)
+        covered = sync is not None and _aware(sync.synced_since) <= since
+
+        if covered and now - _aware(sync.last_synced_at) < SYNC_INTERVAL:
+            return
+
+        if covered:
+            stop_at = _aware(sync.last_synced_at)
+            oldest_open = await models.RacetimeRaceHistory.filter(
+                rtgg_id=rtgg_id,
+                status__not_in=FINAL_STATUSES,
+            ).order_by('opened_at').first().values_list('opened_at', flat=True)
+            if oldest_open is not None:
+                stop_at = min(stop_at, _aware(oldest_open))
+        else:
+            stop_at = since
+
+        races = {}
+        page = 1
+        partial = False
+        while True:
+            data = await _fetch_page(rtgg_id, page)
+            if not data['races']:
+                break
+
+            for race in data['races']:
+                races[race['name']] = {
+                    'category': race['category']['slug'],
+                    'status': race['status']['value'],
+                    'opened_at': _aware(isodate.parse_datetime(race['opened_at'])),
+                }
+
+            if min(r['opened_at'] for r in races.values()) < stop_at or page >= data['num_pages']:
+                break
+
+            if not covered and enough is not None and _count_finished(races, category_slugs, since) >= enough:
+                partial = True
+                break
+            page += 1
+
+        await _store_races(rtgg_id, races)
+
+        if partial:
+            # the sync isn't recorded, since it doesn't cover the window yet, the backfill will record it
+            task = asyncio.create_task(_backfill(rtgg_id, days))
+            _backfill_tasks.add(task)
+            task.add_done_callback(_backfill_tasks.discard)
+            logging.debug("Synced %s racetime.gg races for %s over %s pages, backfilling the rest.", len(races),
+                          rtgg_id, page)
+            return
+
+        if sync is None:
+            await models.RacetimeRaceHistorySync.create(rtgg_id=rtgg_id, last_synced_at=now, synced_since=since)
+        else:
+            sync.last_synced_at = now
+            sync.synced_since = min(_aware(sync.synced_since), since)
+            await sync.save(update_fields=['last_synced_at', 'synced_since'])
+
+        logging.debug("Synced %s racetime.gg races for %s over %s pages.", len(races), rtgg_id, page)
+
+
+async def _backfill(rtgg_id: str, days: int):
+    try:
+        await sync_user(rtgg_id, days)
+    except Exception:
+        logging.exception("Unable to backfill racetime.gg race history for %s.", rtgg_id)
+
+
+def _count_finished(races: Dict[str, dict], category_slugs: List[str], since: datetime.datetime) -> int:
+    return len([
+        r for r in races.values()
+        if r['category'] in category_slugs and r['status'] == 'finished' and r['opened_at'] > since
+    ])
+
+
+async def _store_races(rtgg_id: str, races: Dict[str, dict]):
+    if not races:
+        return
+
+    existing = dict(await models.RacetimeRaceHistory.filter(
+        rtgg_id=rtgg_id,
+        race_name__in=list(races),
+    ).values_list('race_name', 'status'))
+
+    await models.RacetimeRaceHistory.bulk_create([
+        models.RacetimeRaceHistory(rtgg_id=rtgg_id, race_name=name, **race)
+        for name, race in races.items() if name not in existing
+    ])
+
+    changed: Dict[str, List[str]] = {}
+    for name, race in races.items():
+        if name in existing and existing[name] != race['status']:
+            changed.setdefault(race['status'], []).append(name)
+
+    for status, names in changed.items():
+        await models.RacetimeRaceHistory.filter(rtgg_id=rtgg_id, race_name__in=names).update(status=status)
+
+
+async def count_finished_races(rtgg_id: str, category_slugs: List[str], days: int = 365,
+                               enough: Optional[int] = None) -> int:
+    """
+    Counts a user's finished races in the given categories.  If enough is given, the count may stop short of the full
+    total once it reaches that number.
+    """
+    if not category_slugs:
+        return 0
+
+    await sync_user(rtgg_id, days, category_slugs=category_slugs, enough=enough)
+
+    return await models.RacetimeRaceHistory.filter(
+        rtgg_id=rtgg_id,
+        category__in=category_slugs,
+        status='finished',
+        opened_at__gt=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days),
+    ).count()
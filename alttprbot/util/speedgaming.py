@@ -1,14 +1,18 @@
+import asyncio
+import copy
 import json
 import logging
+import time
+from dataclasses import dataclass, field
 from datetime import timedelta, datetime
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 import aiofiles
-import aiohttp
 import pytz
 
 import config
 from alttprbot.exceptions import SahasrahBotException
+from alttprbot.util import http
 
 
 class SGEpisodeNotFoundException(SahasrahBotException):
@@ -19,6 +23,42 @@ class SGEventNotFoundException(SahasrahBotException):
     pass
 
 
+# schedules younger than this are served as-is, older ones are served while being refreshed in the background
+SCHEDULE_CACHE_TTL = 120
+# schedules older than this are never served, and callers wait for a fresh copy
+SCHEDULE_CACHE_MAX_STALE = 600
+SCHEDULE_CACHE_GRACE = timedelta(minutes=1)
+
+
+@dataclass
+class ScheduleCacheEntry:
+    episodes: List[dict]
+    sched_from: datetime
+    sched_to: datetime
+    fetched_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    def covers(self, sched_from: datetime, sched_to: datetime) -> bool:
+        # a schedule fetched moments after the caller computed its window starts slightly later, so allow for that
+        return self.sched_from <= sched_from + SCHEDULE_CACHE_GRACE and self.sched_to >= sched_to
+
+    def get_episode(self, episodeid) -> Optional[dict]:
+        return next((e for e in self.episodes if str(e['id']) == str(episodeid)), None)
+
+
+# cached schedules, keyed by event slug
+SCHEDULE_CACHE: Dict[str, ScheduleCacheEntry] = {}
+
+# the widest (hours_past, hours_future) window requested for each event, so one fetch can serve every caller
+_schedule_windows: Dict[str, Tuple[float, float]] = {}
+
+# schedule fetches currently in flight, keyed by event slug, so concurrent callers share a single request
+_schedule_fetches: Dict[str, asyncio.Task] = {}
+
+
 async def get_upcoming_episodes_by_event(event, hours_past=4, hours_future=4, static_time: datetime=None):
     if config.DEBUG and event == 'test':
         test_schedule = []
@@ -27,18 +67,67 @@ async def get_upcoming_episodes_by_event(event, hours_past=4, hours_future=4, st
             test_schedule.append(episode)
         return test_schedule
 
+    # a fixed point in time isn't something the cache can serve, so always go to SG
     if static_time:
-        now = static_time
-    else:
-        now = datetime.now(tz=pytz.timezone('US/Eastern'))
+        return await fetch_schedule(event, static_time - timedelta(hours=hours_past),
+                                    static_time + timedelta(hours=hours_future))
+
+    widest_past, widest_future = _schedule_windows.get(event, (0, 0))
+    _schedule_windows[event] = (max(widest_past, hours_past), max(widest_future, hours_future))
+
+    now = datetime.now(tz=pytz.timezone('US/Eastern'))
+    sched_from = now - timedelta(hours=hours_past)
+    sched_to = now + timedelta(hours=hours_future)
+
+    entry = SCHEDULE_CACHE.get(event)
+    if entry is None or not entry.covers(sched_from, sched_to) or entry.age > SCHEDULE_CACHE_MAX_STALE:
+        entry = await asyncio.shield(refresh_schedule(event))
+        if not entry.covers(sched_from, sched_to):
+            # we joined a refresh that started before this window was requested, so fetch again
+            entry = await asyncio.shield(refresh_schedule(event))
+    elif entry.age > SCHEDULE_CACHE_TTL:
+        refresh_schedule(event)
+
+    return [copy.deepcopy(e) for e in entry.episodes if sched_from <= datetime.fromisoformat(e['when']) <= sched_to]
+
+
+def refresh_schedule(event) -> asyncio.Task:
+    """
+    Starts a refresh of the cached schedule for an event, covering every window requested for it so far.
+    If a refresh is already in progress, that one is returned instead of starting another.
+    """
+    task = _schedule_fetches.get(event)
+    if task is None or task.done():
+        task = asyncio.create_task(_refresh_schedule(event))
+        task.add_done_callback(_log_refresh_failure)
+        _schedule_fetches[event] = task
+    return task
+
+
+async def _refresh_schedule(event) -> ScheduleCacheEntry:
+    hours_past, hours_future = _schedule_windows.get(event, (4, 4))
+    now = datetime.now(tz=pytz.timezone('US/Eastern'))
     sched_from = now - timedelta(hours=hours_past)
     sched_to = now + timedelta(hours=hours_future)
+
+    episodes = await fetch_schedule(event, sched_from, sched_to)
+    entry = ScheduleCacheEntry(episodes=episodes, sched_from=sched_from, sched_to=sched_to)
+    SCHEDULE_CACHE[event] = entry
+    return entry
+
+
+def _log_refresh_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logging.warning("Unable to refresh SG schedule cache: %s", task.exception())
+
+
+async def fetch_schedule(event, sched_from: datetime, sched_to: datetime) -> List[dict]:
     params = {
         'event': event,
         'from': sched_from.isoformat(),
         'to': sched_to.isoformat()
     }
-    async with aiohttp.request(
+    async with http.get_session(config.SG_API_ENDPOINT).request(
             method='get',
             url=f'{config.SG_API_ENDPOINT}/schedule',
             params=params,
@@ -54,7 +143,25 @@ async def get_upcoming_episodes_by_event(event, hours_past=4, hours_future=4, st
     return schedule
 
 
+def get_cached_episode(episodeid) -> Optional[dict]:
+    """
+    Returns an episode from a cached schedule, if any schedule fresh enough to be served without a refresh contains it.
+    The episode is a copy, so callers are free to modify it.
+    """
+    for entry in SCHEDULE_CACHE.values():
+        if entry.age > SCHEDULE_CACHE_TTL:
+            continue
+        episode = entry.get_episode(episodeid)
+        if episode is not None:
+            return copy.deepcopy(episode)
+    return None
+
+
 async def get_episode(episodeid: int, complete=False):
+    # the schedule only has what SG lists for upcoming episodes, so a complete episode always comes from SG directly
+    if not complete and (episode := get_cached_episode(episodeid)) is not None:
+        return episode
+
     # if we're developing locally, we want to have some artifical data to use that isn't from SpeedGaming
     if config.DEBUG:
         if episodeid == 1:
@@ -69,14 +176,14 @@ async def get_episode(episodeid: int, complete=False):
         elif episodeid == 0:
             result = {"error": "Failed to find episode with id 0."}
         else:
-            async with aiohttp.request(
+            async with http.get_session(config.SG_API_ENDPOINT).request(
                     method='get',
                     url=f'{config.SG_API_ENDPOINT}/episode',
                     params={'id': episodeid},
             ) as resp:
                 result = await resp.json(content_type='text/html')
     else:
-        async with aiohttp.request(
+        async with http.get_session(config.SG_API_ENDPOINT).request(
                 method='get',
                 url=f'{config.SG_API_ENDPOINT}/episode',
                 params={'id': episodeid},
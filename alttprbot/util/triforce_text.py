@@ -35,7 +35,7 @@ async def get_triforce_text_random(pool_name: str):
 
 
 async def generate_with_triforce_text(pool_name: str, preset: str, settings: dict = None, branch: str = "live",
-                                      balanced=True):
+                                      balanced=True, handed_out=True):
     """
     Generate a game with a triforce text.
     """
@@ -54,4 +54,5 @@ async def generate_with_triforce_text(pool_name: str, preset: str, settings: dic
     if settings is not None and isinstance(settings, dict):
         data.preset_data['settings'] = {**data.preset_data['settings'], **settings}
 
-    return await data.generate(allow_quickswap=True, tournament=True, hints=False, spoilers="off", branch=branch)
+    return await data.generate(allow_quickswap=True, tournament=True, hints=False, spoilers="off", branch=branch,
+                               handed_out=handed_out)
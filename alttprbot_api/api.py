@@ -1,3 +1,4 @@
+import dataclasses
 import os
 
 from oauthlib.oauth2.rfc6749.errors import InvalidGrantError, TokenExpiredError
@@ -8,7 +9,13 @@ from quart_discord import (AccessDenied, DiscordOAuth2Session, Unauthorized,
 
 import config
 from alttprbot import models
+from alttprbot.alttprgen.randomizer.alttprdoor import door_generation_queue
+from alttprbot.util import http
+from alttprbot_api import auth
+from alttprbot_audit import retention
+from alttprbot_audit.ingest import audit_message_queue
 from alttprbot_discord.bot import discordbot
+from alttprbot_racetime.misc.timers import room_timers
 
 sahasrahbotapi = Quart(__name__)
 sahasrahbotapi.secret_key = bytes(config.APP_SECRET_KEY, "utf-8")
@@ -119,6 +126,43 @@ async def healthcheck():
     )
 
 
+@sahasrahbotapi.route('/healthcheck/doors', methods=['GET'])
+async def healthcheck_doors():
+    return jsonify(door_generation_queue.get_stats())
+
+
+@sahasrahbotapi.route('/healthcheck/http', methods=['GET'])
+async def healthcheck_http():
+    return jsonify(http.get_connection_stats())
+
+
+@sahasrahbotapi.route('/healthcheck/racetime/timers', methods=['GET'])
+async def healthcheck_racetime_timers():
+    return jsonify(room_timers.pending())
+
+
+@sahasrahbotapi.route('/healthcheck/audit', methods=['GET'])
+async def healthcheck_audit():
+    return jsonify(
+        queue=audit_message_queue.get_stats(),
+        retention=dataclasses.asdict(retention.last_report) if retention.last_report else None,
+    )
+
+
+@sahasrahbotapi.route('/api/admin/keys/usage', methods=['GET'])
+@auth.authorized_key('admin')
+async def api_key_usage():
+    return jsonify(auth.get_usage_stats())
+
+
+@sahasrahbotapi.route('/api/admin/keys/invalidate', methods=['POST'])
+@auth.authorized_key('admin')
+async def api_key_invalidate():
+    payload = await request.get_json(silent=True) or {}
+    auth.invalidate_key(payload.get('key'))
+    return jsonify(success=True)
+
+
 @sahasrahbotapi.route('/purgeme', methods=['GET'])
 async def purge_me():
     user = await discord.fetch_user()
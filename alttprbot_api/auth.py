@@ -1,13 +1,144 @@
 ####################
 # Authorization
 ####################
+import bisect
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from functools import wraps
+from typing import Dict, List, Optional, Tuple
 
 from quart import request
 from quart.wrappers import Response
 
+import config
 from alttprbot import models
 
+# how long to trust a lookup before going back to the database, keys that don't exist are rechecked sooner
+AUTH_CACHE_TTL = getattr(config, 'API_AUTH_CACHE_TTL', 60)
+AUTH_NEGATIVE_CACHE_TTL = getattr(config, 'API_AUTH_NEGATIVE_CACHE_TTL', 10)
+
+# misses are cached under whatever key was sent, so only this many are kept, least recently used go first
+AUTH_NEGATIVE_CACHE_SIZE = getattr(config, 'API_AUTH_NEGATIVE_CACHE_SIZE', 10000)
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+
+@dataclass
+class KeyUsage:
+    requests: int = 0
+    total_seconds: float = 0
+    endpoints: Dict[str, int] = field(default_factory=dict)
+    latency: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def record(self, endpoint: str, elapsed: float):
+        self.requests += 1
+        self.total_seconds += elapsed
+        self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+        self.latency[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            'requests': self.requests,
+            'average_seconds': self.total_seconds / self.requests if self.requests else None,
+            'endpoints': self.endpoints,
+            'latency': {
+                **{f'le_{bucket}': count for bucket, count in zip(LATENCY_BUCKETS, self.latency)},
+                'le_inf': self.latency[-1],
+            },
+        }
+
+
+# (key, type, subtype) -> (name of the key, expiry)
+_permission_cache: Dict[Tuple[str, str, Optional[str]], Tuple[str, float]] = {}
+
+# (key, type, subtype) -> expiry, for lookups that found no permission
+_negative_cache: 'OrderedDict[Tuple[str, str, Optional[str]], float]' = OrderedDict()
+_negative_cache_hits = 0
+
+# usage is tracked by the name of the key, so the keys themselves never show up in the stats
+_key_usage: Dict[str, KeyUsage] = {}
+_rejected_requests = 0
+
+
+async def check_key(auth_key: str, auth_key_type: str, subtype: str = None) -> Optional[str]:
+    """
+    Returns the name of the key if it has the requested permission, otherwise None.
+    """
+    global _negative_cache_hits
+
+    cache_key = (auth_key, auth_key_type, subtype)
+    now = time.monotonic()
+    cached = _permission_cache.get(cache_key)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    negative_expiry = _negative_cache.get(cache_key)
+    if negative_expiry is not None:
+        if negative_expiry > now:
+            _negative_cache.move_to_end(cache_key)
+            _negative_cache_hits += 1
+            return None
+        del _negative_cache[cache_key]
+
+    filter_args = {'auth_key__key': auth_key, 'type': auth_key_type}
+    if subtype is not None:
+        filter_args['subtype'] = subtype
+
+    access = await models.AuthorizationKeyPermissions.filter(**filter_args).first().values('auth_key__name')
+    name = access['auth_key__name'] if access else None
+
+    if name is None:
+        _negative_cache[cache_key] = time.monotonic() + AUTH_NEGATIVE_CACHE_TTL
+        while len(_negative_cache) > AUTH_NEGATIVE_CACHE_SIZE:
+            _negative_cache.popitem(last=False)
+    else:
+        _prune_permission_cache()
+        _permission_cache[cache_key] = (name, time.monotonic() + AUTH_CACHE_TTL)
+    return name
+
+
+def _prune_permission_cache():
+    now = time.monotonic()
+    for cache_key in [k for k, v in _permission_cache.items() if v[1] <= now]:
+        del _permission_cache[cache_key]
+
+
+def invalidate_key(auth_key: str = None):
+    """
+    Drops cached permissions for a key, or for every key if none is given.  Call this after changing a key or its
+    permissions so the change takes effect right away.
+    """
+    if auth_key is None:
+        _permission_cache.clear()
+        _negative_cache.clear()
+        return
+
+    for cache_key in [k for k in _permission_cache if k[0] == auth_key]:
+        del _permission_cache[cache_key]
+    for cache_key in [k for k in _negative_cache if k[0] == auth_key]:
+        del _negative_cache[cache_key]
+
+
+def record_request(key_name: Optional[str], endpoint: str, elapsed: float):
+    global _rejected_requests
+    if key_name is None:
+        _rejected_requests += 1
+        return
+
+    _key_usage.setdefault(key_name, KeyUsage()).record(endpoint, elapsed)
+
+
+def get_usage_stats() -> dict:
+    return {
+        'cached_permissions': len(_permission_cache),
+        'cached_misses': len(_negative_cache),
+        'negative_cache_hits': _negative_cache_hits,
+        'rejected_requests': _rejected_requests,
+        'keys': {name: usage.to_dict() for name, usage in _key_usage.items()},
+    }
+
 
 def authorized_key(auth_key_type):
     def decorator(func):
@@ -15,13 +146,19 @@ def authorized_key(auth_key_type):
         async def wrapper(*args, **kwargs):
             auth_key = request.headers.get('Authorization')
             if auth_key is None:
+                record_request(None, request.endpoint, 0)
                 return Response(status=401)
 
-            access = await models.AuthorizationKeyPermissions.get_or_none(auth_key__key=auth_key, type=auth_key_type)
-            if access is None:
+            start = time.perf_counter()
+            key_name = await check_key(auth_key, auth_key_type)
+            if key_name is None:
+                record_request(None, request.endpoint, 0)
                 return Response(status=401)
 
-            return await func(*args, **kwargs)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                record_request(key_name, request.endpoint, time.perf_counter() - start)
 
         return wrapper
 
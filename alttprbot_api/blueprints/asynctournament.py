@@ -1,6 +1,10 @@
+import csv
 import datetime
+import functools
+import io
+import json
 
-from quart import (Blueprint, abort, jsonify, redirect,
+from quart import (Blueprint, abort, jsonify, make_response, redirect,
                    render_template, request, url_for, Response)
 from quart_discord import requires_authorization, Unauthorized
 from tortoise.contrib.pydantic import pydantic_model_creator, pydantic_queryset_creator
@@ -14,6 +18,48 @@ from alttprbot_api.util import checks
 asynctournament_blueprint = Blueprint('async', __name__)
 
 
+# serializers are built once, on first use, since model relations are only resolved after Tortoise.init() at startup
+@functools.lru_cache(maxsize=None)
+def model_serializer(model):
+    return pydantic_model_creator(model)
+
+
+@functools.lru_cache(maxsize=None)
+def queryset_serializer(model):
+    return pydantic_queryset_creator(model)
+
+
+RACE_EXPORT_CHUNK_SIZE = 1000
+RACE_EXPORT_FIELDS = [
+    'id',
+    'tournament_id',
+    'permalink_id',
+    'permalink__pool_id',
+    'user_id',
+    'thread_id',
+    'thread_open_time',
+    'thread_timeout_time',
+    'start_time',
+    'end_time',
+    'created',
+    'updated',
+    'status',
+    'live_race_id',
+    'reattempted',
+    'reattempt_reason',
+    'runner_notes',
+    'runner_vod_url',
+    'run_collection_rate',
+    'run_igt',
+    'review_status',
+    'reviewed_by_id',
+    'reviewed_at',
+    'reviewer_notes',
+    'score',
+    'score_updated_at',
+]
+
+
 @asynctournament_blueprint.route('/api/tournaments', methods=['GET'])
 @auth.authorized_key('asynctournament')
 async def tournaments_api():
@@ -22,8 +68,7 @@ async def tournaments_api():
         filter_args['active'] = request.args.get('active') == 'true'
 
     qs = models.AsyncTournament.filter(**filter_args)
-    AsyncTournament_Pydantic_List = pydantic_queryset_creator(models.AsyncTournament)
-    res = await AsyncTournament_Pydantic_List.from_queryset(qs)
+    res = await queryset_serializer(models.AsyncTournament).from_queryset(qs)
     return Response(res.json(), mimetype='application/json')
 
 
@@ -34,14 +79,91 @@ async def tournament_api(tournament_id):
     if result is None:
         return jsonify({'error': 'Tournament not found.'})
 
-    AsyncTournament_Pydantic = pydantic_model_creator(models.AsyncTournament)
-    res = await AsyncTournament_Pydantic.from_tortoise_orm(result)
+    res = await model_serializer(models.AsyncTournament).from_tortoise_orm(result)
     return Response(res.json(), mimetype='application/json')
 
 
 @asynctournament_blueprint.route('/api/tournaments/<int:tournament_id>/races', methods=['GET'])
 @auth.authorized_key('asynctournament')
 async def races_api(tournament_id):
+    """
+    Lists races for a tournament.
+
+    Pass the X-Next-After header from a response as the after argument to get the next page.  This pages on the id,
+    so it stays fast no matter how deep you go.  The page argument is still supported, but gets slower on later pages.
+    """
+    filter_args = race_filter_args()
+
+    if request.args.get('page_size'):
+        page_size = int(request.args.get('page_size'))
+        if page_size > 100:
+            return abort(400, 'page_size cannot be greater than 100.')
+    else:
+        page_size = 20
+
+    qs = models.AsyncTournamentRace.filter(tournament_id=tournament_id, **filter_args).order_by('id')
+
+    if request.args.get('after'):
+        qs = qs.filter(id__gt=int(request.args.get('after')))
+    elif request.args.get('page'):
+        qs = qs.offset((int(request.args.get('page')) - 1) * page_size)
+
+    res = await queryset_serializer(models.AsyncTournamentRace).from_queryset(qs.limit(page_size))
+    body = res.json()
+    response = Response(body, mimetype='application/json')
+
+    # read back from the json, which works the same on every pydantic version, rather than the model's internals
+    races = json.loads(body)
+    if len(races) == page_size:
+        response.headers['X-Next-After'] = str(races[-1]['id'])
+    return response
+
+
+@asynctournament_blueprint.route('/api/tournaments/<int:tournament_id>/races/export', methods=['GET'])
+@auth.authorized_key('asynctournament')
+async def races_export_api(tournament_id):
+    """
+    Streams every race matching the same filters as races_api, as either ndjson (the default) or csv.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ['ndjson', 'csv']:
+        return abort(400, 'format must be either ndjson or csv.')
+
+    filter_args = race_filter_args()
+
+    async def generate():
+        if export_format == 'csv':
+            yield csv_line(RACE_EXPORT_FIELDS)
+
+        last_id = 0
+        while True:
+            rows = await models.AsyncTournamentRace.filter(
+                tournament_id=tournament_id,
+                id__gt=last_id,
+                **filter_args
+            ).order_by('id').limit(RACE_EXPORT_CHUNK_SIZE).values_list(*RACE_EXPORT_FIELDS)
+
+            if not rows:
+                break
+
+            if export_format == 'csv':
+                yield ''.join(csv_line(row) for row in rows)
+            else:
+                yield ''.join(json.dumps(dict(zip(RACE_EXPORT_FIELDS, row)), default=str) + '\n' for row in rows)
+
+            if len(rows) < RACE_EXPORT_CHUNK_SIZE:
+                break
+            last_id = rows[-1][0]
+
+    response = Response(
+        generate(),
+        mimetype='text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="tournament-{tournament_id}-races.{export_format}"'
+    return response
+
+
+def race_filter_args():
     filter_args = {}
     if request.args.get('id'):
         filter_args['id'] = request.args.get('id')
@@ -53,25 +175,13 @@ async def races_api(tournament_id):
         filter_args['permalink__pool_id'] = request.args.get('pool_id')
     if request.args.get('status'):
         filter_args['status'] = request.args.get('status')
+    return filter_args
 
-    if request.args.get('page'):
-        page = int(request.args.get('page'))
-    else:
-        page = 1
-
-    if request.args.get('page_size'):
-        page_size = int(request.args.get('page_size'))
-        if page_size > 100:
-            return abort(400, 'page_size cannot be greater than 100.')
-    else:
-        page_size = 20
-
-    qs = models.AsyncTournamentRace.filter(tournament_id=tournament_id, **filter_args).offset(
-        (page - 1) * page_size).limit(page_size)
-    AsyncTournamentRace_Pydantic_List = pydantic_queryset_creator(models.AsyncTournamentRace)
 
-    res = await AsyncTournamentRace_Pydantic_List.from_queryset(qs)
-    return Response(res.json(), mimetype='application/json')
+def csv_line(row) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue()
 
 
 @asynctournament_blueprint.route('/api/tournaments/<int:tournament_id>/pools', methods=['GET'])
@@ -82,8 +192,7 @@ async def pools_api(tournament_id):
         filter_args['id'] = request.args.get('id')
 
     qs = models.AsyncTournamentPermalinkPool.filter(tournament_id=tournament_id, **filter_args)
-    AsyncTournamentPermalinkPool_Pydantic_List = pydantic_queryset_creator(models.AsyncTournamentPermalinkPool)
-    res = await AsyncTournamentPermalinkPool_Pydantic_List.from_queryset(qs)
+    res = await queryset_serializer(models.AsyncTournamentPermalinkPool).from_queryset(qs)
     return Response(res.json(), mimetype='application/json')
 
 
@@ -97,8 +206,7 @@ async def permalinks_api(tournament_id):
         filter_args['pool_id'] = request.args.get('pool_id')
 
     qs = models.AsyncTournamentPermalink.filter(pool__tournament_id=tournament_id, **filter_args)
-    AsyncTournamentPermalink_Pydantic_List = pydantic_queryset_creator(models.AsyncTournamentPermalink)
-    res = await AsyncTournamentPermalink_Pydantic_List.from_queryset(qs)
+    res = await queryset_serializer(models.AsyncTournamentPermalink).from_queryset(qs)
     return Response(res.json(), mimetype='application/json')
 
 
@@ -109,28 +217,34 @@ async def leaderboard_api(tournament_id):
     if tournament is None:
         return jsonify({'error': 'Tournament not found.'})
 
-    leaderboard = await asynctournament.get_leaderboard(tournament)
+    etag = leaderboard_etag(tournament)
+    if tournament.leaderboard_generation and etag in request.if_none_match:
+        return Response(status=304)
+
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', None, type=int)
+    leaderboard = await asynctournament.get_leaderboard(tournament, offset=offset, limit=limit)
 
-    return jsonify([
+    response = jsonify([
         {
             'player': {
-                'id': e.player.id,
-                'display_name': e.player.display_name,
-                'discord_user_id': e.player.discord_user_id,
-                'twitch_name': e.player.twitch_name,
-                'rtgg_id': e.player.rtgg_id,
+                'id': e.user.id,
+                'display_name': e.user.display_name,
+                'discord_user_id': e.user.discord_user_id,
+                'twitch_name': e.user.twitch_name,
+                'rtgg_id': e.user.rtgg_id,
             },
             'score': e.score,
-            'rank': idx + 1,
+            'rank': e.rank,
             'races': [
                 {
-                    'id': race.id,
-                    'start_time': race.start_time,
-                    'end_time': race.end_time,
-                    'score': race.score,
-                    'permalink_id': race.permalink_id,
-                    'elapsed_time': race.elapsed_time_formatted,
-                    'status': race.status,
+                    'id': race['id'],
+                    'start_time': race['start_time'],
+                    'end_time': race['end_time'],
+                    'score': race['score'],
+                    'permalink_id': race['permalink_id'],
+                    'elapsed_time': race['elapsed_time'],
+                    'status': race['status'],
                 } if race else None
                 for race in e.races
             ],
@@ -140,8 +254,18 @@ async def leaderboard_api(tournament_id):
                 'unplayed': e.unattempted_race_count,
             }
         }
-        for idx, e in enumerate(leaderboard)
+        for e in leaderboard
     ])
+    response.set_etag(leaderboard_etag(tournament))
+    return response
+
+
+def leaderboard_etag(tournament: models.AsyncTournament, *extra) -> str:
+    """
+    The leaderboard only changes when a new snapshot generation is written, so that's all the ETag needs.
+    """
+    return '-'.join(str(part) for part in ['leaderboard', tournament.id, tournament.leaderboard_generation, *extra])
+
 
 # public dashboard for the current tournament player
 @asynctournament_blueprint.route('/races/<int:tournament_id>', methods=['GET'])
@@ -206,6 +330,7 @@ async def async_tournament_reattempt_submit(tournament_id: int):
     race.reattempt_reason = reason
 
     await race.save()
+    asynctournament.mark_permalink_dirty(race)
 
     return redirect(url_for('async.async_tournament', tournament_id=tournament_id))
 
@@ -334,6 +459,7 @@ async def async_tournament_review_submit(tournament_id: int, race_id: int):
     race.reviewed_by = user
 
     await race.save()
+    asynctournament.mark_permalink_dirty(race)
 
     return redirect(url_for("async.async_tournament_queue", tournament_id=tournament_id))
 
@@ -357,16 +483,25 @@ async def async_tournament_leaderboard(tournament_id: int):
     if not authorized and tournament.active:
         return abort(403, "You are not authorized to view this tournament.")
 
-    leaderboard = await asynctournament.get_leaderboard(tournament)
-
     if estimate := request.args.get('estimate', 'false') == 'true':
         sort_key = "estimate"
     else:
         sort_key = "score"
 
-    return await render_template('asynctournament_leaderboard.html',
-                                 user=discord_user, tournament=tournament, leaderboard=leaderboard, estimate=estimate,
-                                 sort_key=sort_key)
+    # the page includes the logged in user, so it's part of the ETag too
+    etag = leaderboard_etag(tournament, discord_user.id if discord_user else 0)
+    if tournament.leaderboard_generation and etag in request.if_none_match:
+        return Response(status=304)
+
+    leaderboard = await asynctournament.get_leaderboard(tournament, sort=sort_key)
+    await tournament.fetch_related('permalink_pools')
+
+    response = await make_response(await render_template('asynctournament_leaderboard.html',
+                                                          user=discord_user, tournament=tournament,
+                                                          leaderboard=leaderboard, estimate=estimate,
+                                                          sort_key=sort_key))
+    response.set_etag(leaderboard_etag(tournament, discord_user.id if discord_user else 0))
+    return response
 
 
 @asynctournament_blueprint.route('/player/<int:tournament_id>/<int:user_id>', methods=['GET'])
@@ -74,6 +74,7 @@ async def new_preset_submit(namespace):
             'content': request_files['presetfile'].read().decode()
         }
     )
+    generator.invalidate_namespaced_preset(preset_data.id)
 
     return redirect(
         url_for('presets.presets_for_namespace_randomizer', namespace=ns_data.name, preset=preset_data.preset_name,
@@ -168,6 +169,7 @@ async def update_preset(namespace, randomizer, preset):
 
     if 'delete' in payload:
         await preset_data.delete()
+        generator.invalidate_namespaced_preset(preset_data.id)
         return redirect(url_for('presets.presets_for_namespace', namespace=namespace))
 
     preset_data.content = request_files['presetfile'].read().decode()
@@ -176,6 +178,7 @@ async def update_preset(namespace, randomizer, preset):
         return await render_template('error.html', user=user, title="Oops!",
                                      message="Empty or missing preset file provided.")
     await preset_data.save()
+    generator.invalidate_namespaced_preset(preset_data.id)
 
     return redirect(url_for('presets.get_preset', namespace=namespace, randomizer=randomizer, preset=preset))
 
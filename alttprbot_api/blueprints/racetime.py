@@ -1,4 +1,5 @@
 import datetime
+import time
 from urllib.parse import quote
 
 import aiohttp
@@ -7,6 +8,7 @@ from quart_discord import requires_authorization
 
 import config
 from alttprbot import models
+from alttprbot_api import auth
 from alttprbot_api.api import discord
 from alttprbot_racetime import bot as racetimebot
 
@@ -27,9 +29,10 @@ async def bot_command():
     cmd = data['cmd']
     auth_key = request.args['auth_key']
 
-    access = await models.AuthorizationKeyPermissions.get_or_none(auth_key__key=auth_key, type='racetimecmd',
-                                                                  subtype=category)
-    if access is None:
+    start = time.perf_counter()
+    key_name = await auth.check_key(auth_key, 'racetimecmd', subtype=category)
+    if key_name is None:
+        auth.record_request(None, request.endpoint, 0)
         return abort(403)
 
     racetime_bot = racetimebot.racetime_bots.get(category)
@@ -71,6 +74,7 @@ async def bot_command():
     await racetime_handler.send_message(f"Executing command from API request: {cmd}")
     await racetime_handler.chat_message(fake_data)
 
+    auth.record_request(key_name, request.endpoint, time.perf_counter() - start)
     return jsonify({'success': True})
 
 
@@ -10,7 +10,7 @@ from quart import Blueprint, redirect, render_template, request
 from quart_discord import Unauthorized
 
 from alttprbot import models
-from alttprbot.alttprgen import generator
+from alttprbot.alttprgen import generator, seedpool
 from alttprbot.alttprgen.randomizer import roll_ffr, roll_ootr
 from alttprbot.alttprgen.randomizer.smdash import create_smdash
 from alttprbot.util import triforce_text, speedgaming
@@ -106,9 +106,11 @@ async def sglive_dashboard():
 async def sglive_generate_alttpr():
     preset = "sglive2024"
     # seed = await generator.ALTTPRPreset(preset).generate(allow_quickswap=True, tournament=True, hints=False, spoilers="off", branch="tournament")
-    seed = await triforce_text.generate_with_triforce_text(pool_name="sgl24", preset=preset, balanced=False)
+    seed = await seedpool.claim_alttpr(preset, branch="live")
+    if seed is None:
+        seed = await triforce_text.generate_with_triforce_text(pool_name="sgl24", preset=preset, balanced=False)
+        await asyncio.sleep(2)  # workaround for tournament branch seeds not being available immediately
     logging.info("sglive - Generated ALTTPR seed %s", seed.url)
-    await asyncio.sleep(2)  # workaround for tournament branch seeds not being available immediately
     await models.SGL2023OnsiteHistory.create(
         tournament="alttpr",
         url=seed.url,
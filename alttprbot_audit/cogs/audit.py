@@ -1,5 +1,4 @@
 import csv
-import datetime
 import io
 from contextlib import closing
 
@@ -7,17 +6,25 @@ import discord
 from discord.ext import commands, tasks
 
 from alttprbot import models
+from alttprbot_audit import retention
+from alttprbot_audit.ingest import audit_message_queue
+from alttprbot_discord.util import guild_config
 
 
 class Audit(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.clean_history.start()
+        audit_message_queue.start()
+
+    async def cog_unload(self):
+        self.clean_history.cancel()
+        await audit_message_queue.stop()
 
     @tasks.loop(hours=24, reconnect=True)
     async def clean_history(self):
-        thirty_days_ago = datetime.datetime.utcnow() - datetime.timedelta(days=30)
-        await models.AuditMessages.filter(message_date__lte=thirty_days_ago).delete()
+        await audit_message_queue.flush()
+        await retention.purge_audit_history()
 
     @clean_history.before_loop
     async def before_clean_history(self):
@@ -26,6 +33,7 @@ class Audit(commands.Cog):
     @commands.command()
     @commands.has_guild_permissions(manage_messages=True)
     async def messagehistory(self, ctx, member: discord.Member, limit=500):
+        await audit_message_queue.flush()
         messages = await models.AuditMessages.filter(guild_id=ctx.guild.id, user_id=member.id).limit(limit).values()
 
         fields = ['message_date', 'content', 'attachment', 'deleted']
@@ -41,6 +49,7 @@ class Audit(commands.Cog):
     @commands.command()
     @commands.has_guild_permissions(manage_messages=True)
     async def deletedhistory(self, ctx, member: discord.Member, limit=500):
+        await audit_message_queue.flush()
         messages = await models.AuditMessages.filter(guild_id=ctx.guild.id, user_id=member.id, deleted=1).limit(
             limit).values()
 
@@ -77,7 +86,7 @@ class Audit(commands.Cog):
         # if message.author.bot:
         #     return
 
-        audit_channel_id = await guild.config_get('AuditLogChannel')
+        audit_channel_id = guild_config.store.get(guild.id, 'AuditLogChannel')
         if audit_channel_id:
             embed = await audit_embed_delete(guild, channel, payload.message_id)
             audit_channel = discord.utils.get(
@@ -85,11 +94,7 @@ class Audit(commands.Cog):
 
             await audit_channel.send(embed=embed)
 
-            cached_messages = await models.AuditMessages.filter(message_id=payload.message_id)
-            if cached_messages:
-                for msg in cached_messages:
-                    msg.deleted = 1
-                    await msg.save(update_fields=['deleted'])
+            audit_message_queue.mark_deleted([payload.message_id])
 
     @commands.Cog.listener()
     async def on_raw_bulk_message_delete(self, payload):
@@ -102,19 +107,16 @@ class Audit(commands.Cog):
         # if message.author.bot:
         #     return
 
-        audit_channel_id = await guild.config_get('AuditLogChannel')
+        audit_channel_id = guild_config.store.get(guild.id, 'AuditLogChannel')
         if not audit_channel_id:
             return
 
         audit_channel = discord.utils.get(guild.channels, id=int(audit_channel_id))
 
-        for message_id in payload.message_ids:
-            embed = await audit_embed_delete(guild, channel, message_id)
+        embed, transcript = await audit_bulk_delete_report(guild, channel, payload.message_ids)
+        await audit_channel.send(embed=embed, file=transcript)
 
-            await audit_channel.send(embed=embed)
-            cached_message = await models.AuditMessages.get(message_id=message_id)
-            cached_message.deleted = 1
-            await cached_message.save()
+        audit_message_queue.mark_deleted(payload.message_ids)
 
     @commands.Cog.listener()
     async def on_raw_message_edit(self, payload):
@@ -130,12 +132,15 @@ class Audit(commands.Cog):
         if message.author.bot:
             return
 
-        old_message = await models.AuditMessages.filter(message_id=message.id).order_by('id').values()
-        if old_message and old_message[-1]['content'] == message.content:
+        audit_channel_id = guild_config.store.get(message.guild.id, 'AuditLogChannel')
+
+        # the previous version may still be buffered, in which case there's no need to go to the database
+        old_contents = audit_message_queue.pending_contents(message.id) or await models.AuditMessages.filter(
+            message_id=message.id).order_by('id').values_list('content', flat=True)
+        if old_contents and old_contents[-1] == message.content:
             return
-        audit_channel_id = await message.guild.config_get('AuditLogChannel')
         if audit_channel_id:
-            embed = await audit_embed_edit(old_message, message)
+            embed = await audit_embed_edit(old_contents, message)
             audit_channel = discord.utils.get(
                 message.guild.channels, id=int(audit_channel_id))
 
@@ -167,8 +172,8 @@ class Audit(commands.Cog):
     async def on_member_join(self, member):
         if member.guild is None:
             return
-        if await member.guild.config_get('AuditLogging') == 'true':
-            audit_channel_id = await member.guild.config_get('AuditLogChannel')
+        if guild_config.store.get_bool(member.guild.id, 'AuditLogging'):
+            audit_channel_id = guild_config.store.get(member.guild.id, 'AuditLogChannel')
             if audit_channel_id:
                 embed = await audit_embed_member_joined(member)
                 audit_channel = discord.utils.get(
@@ -180,8 +185,8 @@ class Audit(commands.Cog):
     async def on_member_remove(self, member):
         if member.guild is None:
             return
-        if await member.guild.config_get('AuditLogging') == 'true':
-            audit_channel_id = await member.guild.config_get('AuditLogChannel')
+        if guild_config.store.get_bool(member.guild.id, 'AuditLogging'):
+            audit_channel_id = guild_config.store.get(member.guild.id, 'AuditLogChannel')
             if audit_channel_id:
                 embed = await audit_embed_member_left(member)
                 audit_channel = discord.utils.get(
@@ -225,8 +230,8 @@ class Audit(commands.Cog):
     async def on_member_ban(self, guild: discord.Guild, user):
         if guild is None:
             return
-        if await guild.config_get('AuditLogging') == 'true':
-            audit_channel_id = await guild.config_get('AuditLogChannel')
+        if guild_config.store.get_bool(guild.id, 'AuditLogging'):
+            audit_channel_id = guild_config.store.get(guild.id, 'AuditLogChannel')
             if audit_channel_id:
                 embed = await audit_embed_member_banned(user)
                 audit_channel = discord.utils.get(guild.channels, id=int(audit_channel_id))
@@ -292,11 +297,11 @@ async def audit_embed_member_banned(member):
     return embed
 
 
-async def audit_embed_edit(old_message, message):
-    if not old_message:
+async def audit_embed_edit(old_contents, message):
+    if not old_contents:
         old_content = '??? err unknown ???'
     else:
-        old_content = old_message[-1]['content']
+        old_content = old_contents[-1]
 
     old_content = '*empty*' if old_content == '' else old_content
     new_content = '*empty*' if message.content == '' else message.content
@@ -317,9 +322,13 @@ async def audit_embed_edit(old_message, message):
     return embed
 
 
-async def audit_embed_delete(guild: discord.Guild, channel, message_id, bulk=False):
-    old_message = await models.AuditMessages.filter(message_id=message_id).order_by('id').values()
-    if old_message is None:
+async def audit_embed_delete(guild: discord.Guild, channel, message_id):
+    # versions still in the queue are newer than anything written, so they go last
+    old_message = [
+        *await models.AuditMessages.filter(message_id=message_id).order_by('id').values(),
+        *audit_message_queue.pending_records(message_id),
+    ]
+    if not old_message:
         author = None
         old_content = '*unknown*'
         old_attachment_url = None
@@ -335,7 +344,7 @@ async def audit_embed_delete(guild: discord.Guild, channel, message_id, bulk=Fal
     old_content = '*empty*' if old_content == '' else old_content
 
     embed = discord.Embed(
-        title="Bulk Message Deleted" if bulk else "Message Deleted",
+        title="Message Deleted",
         description=f"**Message sent by {'unknown' if author is None else author.mention} was deleted in {channel.mention}.**",
         color=discord.Colour.dark_red(),
         timestamp=discord.utils.utcnow()
@@ -353,17 +362,66 @@ async def audit_embed_delete(guild: discord.Guild, channel, message_id, bulk=Fal
     return embed
 
 
-async def record_message(message):
-    await models.AuditMessages.create(
-        guild_id=message.guild.id if message.guild else 0,
-        message_id=message.id,
-        user_id=message.author.id,
-        channel_id=message.channel.id,
-        message_date=message.created_at,
-        content=message.content,
-        attachment=message.attachments[0].url if message.attachments else None
+async def audit_bulk_delete_report(guild: discord.Guild, channel, message_ids):
+    """
+    Builds a single embed summarising a purge, plus a transcript of every deleted message we have a record of.
+    """
+    await audit_message_queue.flush()
+    records = await models.AuditMessages.filter(message_id__in=list(message_ids)).order_by('id').values()
+
+    # edits are stored as extra rows, keep the first timestamp and the latest content for each message
+    messages = {}
+    for record in records:
+        if record['message_id'] in messages:
+            messages[record['message_id']] = {**record, 'message_date': messages[record['message_id']]['message_date']}
+        else:
+            messages[record['message_id']] = record
+
+    if guild.chunked is False:
+        await guild.chunk(cache=True)
+
+    authors = {}
+    lines = []
+    for message in sorted(messages.values(), key=lambda m: m['message_date']):
+        author = guild.get_member(int(message['user_id']))
+        authors[message['user_id']] = authors.get(message['user_id'], 0) + 1
+        lines.append(f"[{message['message_date']} UTC] {'unknown' if author is None else author} ({message['user_id']}):")
+        lines.append(message['content'] or '*empty*')
+        if message['attachment']:
+            lines.append(f"Attachment: {message['attachment']}")
+        lines.append('')
+
+    unknown = len(message_ids) - len(messages)
+    if unknown:
+        lines.append(f"{unknown} deleted messages were not in the audit log.")
+
+    embed = discord.Embed(
+        title="Bulk Message Deleted",
+        description=f"**{len(message_ids)} messages were deleted in {channel.mention}.**  The full transcript is attached.",
+        color=discord.Colour.dark_red(),
+        timestamp=discord.utils.utcnow()
+    )
+
+    author_summary = '\n'.join(
+        f"<@{user_id}>: {count}" for user_id, count in sorted(authors.items(), key=lambda a: a[1], reverse=True)
+    )
+    if author_summary:
+        embed.add_field(name='Authors', value=author_summary[:1020] + (
+            '...' if len(author_summary) > 1020 else ''), inline=False)
+    embed.add_field(name='Logged Messages', value=f"{len(messages)} of {len(message_ids)}", inline=False)
+    embed.set_footer(text="Logged at")
+
+    transcript = discord.File(
+        fp=io.BytesIO('\n'.join(lines).encode('utf-8')),
+        filename=f"{channel.id}_bulk_delete_{discord.utils.utcnow():%Y%m%d%H%M%S}.txt"
     )
 
+    return embed, transcript
+
+
+async def record_message(message):
+    audit_message_queue.record(message)
+
 
 async def setup(bot):
     await bot.add_cog(Audit(bot))
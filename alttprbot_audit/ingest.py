@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Iterable, List, Set
+
+import discord
+
+import config
+from alttprbot import models
+
+# buffered messages are written once this many are waiting, or every AUDIT_FLUSH_INTERVAL seconds, whichever is first
+AUDIT_FLUSH_SIZE = getattr(config, 'AUDIT_FLUSH_SIZE', 200)
+AUDIT_FLUSH_INTERVAL = getattr(config, 'AUDIT_FLUSH_INTERVAL', 5)
+
+# if the database is unavailable for a while, the oldest buffered messages are dropped past this point
+AUDIT_MAX_BUFFERED = getattr(config, 'AUDIT_MAX_BUFFERED', 20000)
+
+
+class AuditMessageQueue:
+    """
+    Buffers audit log messages and deleted flags, and writes them out in batches.
+
+    Anything that reads AuditMessages should either flush() first, or also look at pending_records(), so it sees
+    messages that are still buffered.
+    """
+
+    def __init__(self, flush_size: int, flush_interval: int, max_buffered: int):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pending_messages: Deque[models.AuditMessages] = deque()
+        self.pending_deletes: Set[int] = set()
+        self.max_buffered = max_buffered
+        self._writing: List[models.AuditMessages] = []
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task = None
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self.stats = {
+            'flushes': 0,
+            'failed_flushes': 0,
+            'messages_written': 0,
+            'deletes_written': 0,
+            'dropped': 0,
+            'max_depth': 0,
+            'total_flush_duration': 0.0,
+            'max_flush_duration': 0.0,
+            'last_flush_duration': 0.0,
+        }
+
+    def record(self, message: discord.Message):
+        self.pending_messages.append(models.AuditMessages(
+            guild_id=message.guild.id if message.guild else 0,
+            message_id=message.id,
+            user_id=message.author.id,
+            channel_id=message.channel.id,
+            message_date=message.created_at,
+            content=message.content,
+            attachment=message.attachments[0].url if message.attachments else None
+        ))
+        self._trim()
+        self._after_enqueue()
+
+    def mark_deleted(self, message_ids: Iterable[int]):
+        self.pending_deletes.update(message_ids)
+        self._after_enqueue()
+
+    def pending_records(self, message_id: int) -> List[dict]:
+        """
+        The versions of a message that haven't been written yet, oldest first, shaped like rows from values().
+        """
+        return [
+            {
+                'message_id': m.message_id,
+                'guild_id': m.guild_id,
+                'user_id': m.user_id,
+                'channel_id': m.channel_id,
+                'message_date': m.message_date,
+                'content': m.content,
+                'attachment': m.attachment,
+            }
+            for m in [*self._writing, *self.pending_messages] if m.message_id == message_id
+        ]
+
+    def pending_contents(self, message_id: int) -> List[str]:
+        """
+        Content of the versions of a message that haven't been written yet, oldest first.
+        """
+        return [r['content'] for r in self.pending_records(message_id)]
+
+    def depth(self) -> int:
+        return len(self.pending_messages) + len(self.pending_deletes)
+
+    def _trim(self):
+        while len(self.pending_messages) > self.max_buffered:
+            self.pending_messages.popleft()
+            self.stats['dropped'] += 1
+
+    def _after_enqueue(self):
+        self.stats['max_depth'] = max(self.stats['max_depth'], self.depth())
+        if self.depth() >= self.flush_size and not self._lock.locked():
+            task = asyncio.create_task(self.flush())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending_messages and not self.pending_deletes:
+                return
+
+            messages = list(self.pending_messages)
+            deletes = list(self.pending_deletes)
+            self.pending_messages.clear()
+            self.pending_deletes.clear()
+            self._writing = messages
+
+            start = time.monotonic()
+            written = False
+            try:
+                if messages:
+                    await models.AuditMessages.bulk_create(messages)
+                    self.stats['messages_written'] += len(messages)
+                written = True
+
+                # inserted first so this also flags messages that were deleted before they were written
+                if deletes:
+                    await models.AuditMessages.filter(message_id__in=deletes).update(deleted=1)
+                    self.stats['deletes_written'] += len(deletes)
+            except Exception:
+                logging.exception("Unable to write %s audit messages and %s deletes, will try again.",
+                                  len(messages), len(deletes))
+                self.stats['failed_flushes'] += 1
+
+                if not written:
+                    self.pending_messages.extendleft(reversed(messages))
+                    self._trim()
+                self.pending_deletes.update(deletes)
+                return
+            finally:
+                self._writing = []
+                duration = time.monotonic() - start
+                self.stats['last_flush_duration'] = duration
+                self.stats['total_flush_duration'] += duration
+                self.stats['max_flush_duration'] = max(self.stats['max_flush_duration'], duration)
+
+            self.stats['flushes'] += 1
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logging.exception("Exception while flushing the audit message queue.")
+
+    def get_stats(self) -> dict:
+        return {
+            'queued_messages': len(self.pending_messages),
+            'queued_deletes': len(self.pending_deletes),
+            **self.stats,
+            'avg_flush_duration': self.stats['total_flush_duration'] / self.stats['flushes'] if self.stats['flushes'] else 0,
+        }
+
+
+audit_message_queue = AuditMessageQueue(
+    flush_size=AUDIT_FLUSH_SIZE,
+    flush_interval=AUDIT_FLUSH_INTERVAL,
+    max_buffered=AUDIT_MAX_BUFFERED,
+)
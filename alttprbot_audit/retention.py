@@ -0,0 +1,109 @@
+import asyncio
+import datetime
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from tortoise.expressions import Q
+
+import config
+from alttprbot import models
+from alttprbot_discord.util import guild_config
+
+# how long audit messages are kept, a guild can override this with the AuditRetentionDays config parameter
+AUDIT_RETENTION_DAYS = getattr(config, 'AUDIT_RETENTION_DAYS', 30)
+
+# rows are deleted in batches this size with a pause in between, so other writes to the table aren't stuck
+# waiting on one huge delete
+AUDIT_RETENTION_BATCH_SIZE = getattr(config, 'AUDIT_RETENTION_BATCH_SIZE', 5000)
+AUDIT_RETENTION_BATCH_PAUSE = getattr(config, 'AUDIT_RETENTION_BATCH_PAUSE', 1)
+
+
+@dataclass
+class RetentionReport:
+    purged: int = 0
+    batches: int = 0
+    seconds: float = 0
+    purged_by_guild: Dict[int, int] = field(default_factory=dict)
+    finished_at: Optional[datetime.datetime] = None
+
+
+last_report: Optional[RetentionReport] = None
+
+
+def retention_overrides() -> Dict[int, int]:
+    overrides = {}
+    for guild_id, value in guild_config.store.guilds_with('AuditRetentionDays').items():
+        try:
+            overrides[guild_id] = int(value)
+        except (TypeError, ValueError):
+            logging.warning("Ignoring invalid AuditRetentionDays %r for guild %s.", value, guild_id)
+    return overrides
+
+
+async def purge_batches(report: RetentionReport, *args, **filter_args) -> int:
+    purged = 0
+    resume_from = None
+    while True:
+        # walks the message_date index, carrying on from the last batch so rows the filter skipped aren't read again
+        query = models.AuditMessages.filter(*args, **filter_args)
+        if resume_from is not None:
+            query = query.filter(message_date__gte=resume_from)
+        rows = await query.order_by('message_date').limit(
+            AUDIT_RETENTION_BATCH_SIZE).values_list('id', 'message_date')
+        if not rows:
+            break
+
+        ids = [row[0] for row in rows]
+        resume_from = rows[-1][1]
+
+        await models.AuditMessages.filter(id__in=ids).delete()
+        purged += len(ids)
+        report.batches += 1
+
+        if len(ids) < AUDIT_RETENTION_BATCH_SIZE:
+            break
+        await asyncio.sleep(AUDIT_RETENTION_BATCH_PAUSE)
+
+    report.purged += purged
+    return purged
+
+
+async def purge_audit_history() -> RetentionReport:
+    """
+    Deletes audit messages older than each guild's retention period.
+    """
+    report = RetentionReport()
+    start = time.monotonic()
+    now = datetime.datetime.utcnow()
+
+    overrides = retention_overrides()
+
+    for guild_id, days in overrides.items():
+        purged = await purge_batches(
+            report,
+            guild_id=guild_id,
+            message_date__lte=now - datetime.timedelta(days=days),
+        )
+        if purged:
+            report.purged_by_guild[guild_id] = purged
+
+    default_cutoff = now - datetime.timedelta(days=AUDIT_RETENTION_DAYS)
+    if overrides:
+        # NOT IN never matches a NULL guild_id, so those rows need to be asked for explicitly
+        await purge_batches(
+            report,
+            Q(guild_id__not_in=list(overrides)) | Q(guild_id=None),
+            message_date__lte=default_cutoff,
+        )
+    else:
+        await purge_batches(report, message_date__lte=default_cutoff)
+
+    report.seconds = time.monotonic() - start
+    report.finished_at = datetime.datetime.utcnow()
+
+    global last_report
+    last_report = report
+    logging.info("Purged %s audit messages in %s batches, took %.1fs.", report.purged, report.batches, report.seconds)
+    return report
@@ -15,6 +15,7 @@ from slugify import slugify
 import config
 from alttprbot import models
 from alttprbot.util import asynctournament, triforce_text
+from alttprbot.util.deadlines import DeadlineScheduler
 from alttprbot_api.util import checks
 from alttprbot.alttprgen import generator
 
@@ -26,6 +27,48 @@ YES_NO_CHOICE = [
     app_commands.Choice(name="No", value=False),
 ]
 
+# make these configurable
+PENDING_RACE_TIMEOUT = datetime.timedelta(minutes=20)
+PENDING_RACE_WARNING = datetime.timedelta(minutes=10)
+IN_PROGRESS_RACE_TIMEOUT = datetime.timedelta(hours=12)
+
+RACE_DEADLINE_KINDS = ["pending_warning", "pending_forfeit", "in_progress_forfeit"]
+
+# warnings and timeouts for open race threads, keyed by (kind, race id)
+race_deadlines = DeadlineScheduler()
+
+
+def get_race_deadline(race: models.AsyncTournamentRace, kind: str):
+    if race.thread_id is None:
+        return None
+
+    if race.status == "pending" and kind in ["pending_warning", "pending_forfeit"]:
+        if race.thread_timeout_time is None:
+            race.thread_timeout_time = race.thread_open_time + PENDING_RACE_TIMEOUT
+        if kind == "pending_forfeit":
+            return race.thread_timeout_time
+        # no point in warning once the timeout has passed, like after a restart
+        if race.thread_timeout_time > discord.utils.utcnow():
+            return race.thread_timeout_time - PENDING_RACE_WARNING
+
+    if race.status == "in_progress" and kind == "in_progress_forfeit" and race.start_time is not None:
+        return race.start_time + IN_PROGRESS_RACE_TIMEOUT
+
+    return None
+
+
+def update_race_deadlines(race: models.AsyncTournamentRace):
+    """
+    Schedules or clears the warning and timeout deadlines of a race to match its current state.
+    This should be called whenever a race is created, started, extended or completed.
+    """
+    for kind in RACE_DEADLINE_KINDS:
+        deadline = get_race_deadline(race, kind)
+        if deadline is None:
+            race_deadlines.cancel((kind, race.id))
+        else:
+            race_deadlines.schedule((kind, race.id), deadline)
+
 
 class AsyncTournamentView(discord.ui.View):
     def __init__(self):
@@ -328,6 +371,7 @@ class AsyncTournamentRaceViewConfirmNewRace(discord.ui.View):
             thread_open_time=discord.utils.utcnow(),
             permalink=permalink,
         )
+        update_race_deadlines(async_tournament_race)
 
         # Invite the user to the thread
         await thread.add_user(interaction.user)
@@ -491,6 +535,7 @@ class AsyncTournamentRaceViewReady(discord.ui.View):
 
         tournament_race.start_time = start_time
         await tournament_race.save()
+        update_race_deadlines(tournament_race)
 
         await models.AsyncTournamentAuditLog.create(
             tournament_id=tournament_race.tournament_id,
@@ -596,6 +641,8 @@ class AsyncTournamentRaceViewForfeit(discord.ui.View):
 
         async_tournament_race.status = "forfeit"
         await async_tournament_race.save()
+        update_race_deadlines(async_tournament_race)
+        asynctournament.mark_permalink_dirty(async_tournament_race)
         await interaction.response.send_message(f"This run has been forfeited by {interaction.user.mention}.")
         for child_item in self.children:
             child_item.disabled = True
@@ -681,102 +728,94 @@ class SubmitCollectIGTModal(discord.ui.Modal, title="Submit Collection Rate and
 class AsyncTournament(commands.GroupCog, name="async"):
     def __init__(self, bot):
         self.bot: commands.Bot = bot
-        self.timeout_warning_task.start()
-        self.timeout_in_progress_races_task.start()
+        race_deadlines.callback = self.race_deadline_reached
+        self.load_race_deadlines.start()
         self.score_calculation_task.start()
         self.persistent_views_added = False
 
-    @tasks.loop(seconds=60, reconnect=True)
-    async def timeout_warning_task(self):
-        try:
-            pending_races = await models.AsyncTournamentRace.filter(status="pending",
-                                                                    thread_id__isnull=False).prefetch_related('user')
-            for pending_race in pending_races:
-                # make these configurable
-                if pending_race.thread_timeout_time is None:
-                    pending_race.thread_timeout_time = pending_race.thread_open_time + datetime.timedelta(minutes=20)
-                    await pending_race.save()
-
-                warning_time = pending_race.thread_timeout_time - datetime.timedelta(minutes=10)
-                forfeit_time = pending_race.thread_timeout_time
-
-                thread = self.bot.get_channel(pending_race.thread_id)
-                if thread is None:
-                    logging.warning("Cannot access thread for pending race %s.  This should not have happened.",
-                                    pending_race.id)
-                    continue
-
-                if warning_time < discord.utils.utcnow() < forfeit_time:
-                    await thread.send(
-                        f"<@{pending_race.user.discord_user_id}>, your race will be permanently forfeit on {discord.utils.format_dt(forfeit_time, 'f')} ({discord.utils.format_dt(forfeit_time, 'R')}) if you do not start it by then.  Please start your run as soon as possible.  Please ping the @Admins if you require more time.",
-                        allowed_mentions=discord.AllowedMentions(users=True))
-
-                if forfeit_time < discord.utils.utcnow():
-                    await thread.send(
-                        f"<@{pending_race.user.discord_user_id}>, the grace period for the start of this run has elapsed.  This run has been forfeit.  Please contact the @Admins if you believe this was in error.",
-                        allowed_mentions=discord.AllowedMentions(users=True))
-                    pending_race.status = "forfeit"
-                    await pending_race.save()
-                    await models.AsyncTournamentAuditLog.create(
-                        tournament_id=pending_race.tournament_id,
-                        action="timeout_forfeit",
-                        details=f"{pending_race.id} was automatically forfeited by System due to timeout",
-                    )
-        except Exception:
-            logging.exception("Exception in timeout_warning_task")
+    async def cog_unload(self):
+        race_deadlines.stop()
+
+    @tasks.loop(count=1)
+    async def load_race_deadlines(self):
+        races = await models.AsyncTournamentRace.filter(status__in=["pending", "in_progress"],
+                                                        thread_id__isnull=False)
+        for race in races:
+            update_race_deadlines(race)
+        race_deadlines.start()
+        logging.info("Loaded %s async tournament race deadlines", len(race_deadlines))
+
+    async def race_deadline_reached(self, key):
+        kind, race_id = key
+        race = await models.AsyncTournamentRace.get_or_none(id=race_id).prefetch_related('user')
+        if race is None:
+            return
 
-    @tasks.loop(seconds=60, reconnect=True)
-    async def timeout_in_progress_races_task(self):
-        try:
-            races = await models.AsyncTournamentRace.filter(status="in_progress",
-                                                            thread_id__isnull=False).prefetch_related('user')
-            for race in races:
-                if race.start_time is None:
-                    continue
-
-                if race.start_time + datetime.timedelta(hours=12) > discord.utils.utcnow():
-                    # this race is still in progress and has not timed out
-                    continue
-
-                thread = self.bot.get_channel(race.thread_id)
-                if thread is None:
-                    logging.warning("Cannot access thread for pending race %s.  This should not have happened.",
-                                    race.id)
-                    continue
-
-                await thread.send(
-                    f"<@{race.user.discord_user_id}>, this race has exceeded 12 hours.  This run has been forfeit.  Please contact the @Admins if you believe this was in error.",
-                    allowed_mentions=discord.AllowedMentions(users=True))
-                race.status = "forfeit"
-                await race.save()
-                await models.AsyncTournamentAuditLog.create(
-                    tournament_id=race.tournament_id,
-                    action="timeout_forfeit",
-                    details=f"in progress race \"{race.id}\" was automatically forfeited by System due to timeout",
-                )
-        except Exception:
-            logging.exception("Exception in timeout_in_progress_races_task")
+        # the race may have changed without going through update_race_deadlines, so check it's still due
+        deadline = get_race_deadline(race, kind)
+        if deadline is None:
+            return
+        if deadline > discord.utils.utcnow():
+            race_deadlines.schedule(key, deadline)
+            return
+
+        thread = self.bot.get_channel(race.thread_id)
+        if thread is None:
+            logging.warning("Cannot access thread for pending race %s.  This should not have happened.", race.id)
+            return
+
+        if kind == "pending_warning":
+            forfeit_time = race.thread_timeout_time
+            await thread.send(
+                f"<@{race.user.discord_user_id}>, your race will be permanently forfeit on {discord.utils.format_dt(forfeit_time, 'f')} ({discord.utils.format_dt(forfeit_time, 'R')}) if you do not start it by then.  Please start your run as soon as possible.  Please ping the @Admins if you require more time.",
+                allowed_mentions=discord.AllowedMentions(users=True))
+
+        elif kind == "pending_forfeit":
+            await thread.send(
+                f"<@{race.user.discord_user_id}>, the grace period for the start of this run has elapsed.  This run has been forfeit.  Please contact the @Admins if you believe this was in error.",
+                allowed_mentions=discord.AllowedMentions(users=True))
+            race.status = "forfeit"
+            await race.save()
+            update_race_deadlines(race)
+            asynctournament.mark_permalink_dirty(race)
+            await models.AsyncTournamentAuditLog.create(
+                tournament_id=race.tournament_id,
+                action="timeout_forfeit",
+                details=f"{race.id} was automatically forfeited by System due to timeout",
+            )
+
+        elif kind == "in_progress_forfeit":
+            await thread.send(
+                f"<@{race.user.discord_user_id}>, this race has exceeded 12 hours.  This run has been forfeit.  Please contact the @Admins if you believe this was in error.",
+                allowed_mentions=discord.AllowedMentions(users=True))
+            race.status = "forfeit"
+            await race.save()
+            update_race_deadlines(race)
+            asynctournament.mark_permalink_dirty(race)
+            await models.AsyncTournamentAuditLog.create(
+                tournament_id=race.tournament_id,
+                action="timeout_forfeit",
+                details=f"in progress race \"{race.id}\" was automatically forfeited by System due to timeout",
+            )
 
     @tasks.loop(hours=1, reconnect=True)
     async def score_calculation_task(self):
         try:
+            # the first run after startup is a full recalculation, since changes made before a restart aren't tracked
+            only_dirty = self.score_calculation_task.current_loop > 0
             tournaments = await models.AsyncTournament.filter(active=True)
             for tournament in tournaments:
                 logging.info("Calculating scores for tournament %s", tournament.id)
                 try:
-                    await asynctournament.calculate_async_tournament(tournament)
+                    await asynctournament.calculate_async_tournament(tournament, only_dirty=only_dirty)
                 except Exception:
                     logging.exception("Exception in score_calculation_task for tournament %s", tournament.id)
                 logging.info("Finished calculating scores for tournament %s", tournament.id)
         except Exception:
             logging.exception("Exception in score_calculation_task")
 
-    @timeout_warning_task.before_loop
-    async def before_timeout_warning_task(self):
-        await self.bot.wait_until_ready()
-
-    @timeout_in_progress_races_task.before_loop
-    async def before_timeout_in_progress_races_task(self):
+    @load_race_deadlines.before_loop
+    async def before_load_race_deadlines(self):
         await self.bot.wait_until_ready()
 
     @score_calculation_task.before_loop
@@ -916,6 +955,7 @@ class AsyncTournament(commands.GroupCog, name="async"):
 
         async_tournament_race.thread_timeout_time = thread_timeout_time
         await async_tournament_race.save()
+        update_race_deadlines(async_tournament_race)
 
         await models.AsyncTournamentAuditLog.create(
             tournament_id=async_tournament_race.tournament_id,
@@ -1089,6 +1129,8 @@ class AsyncTournament(commands.GroupCog, name="async"):
                     f"{entrant['user']['name']} is not finished, forfeited, or disqualified.  THis runner is likely still in progress, and this race will need to be recorded again.")
 
             await race.save()
+            update_race_deadlines(race)
+            asynctournament.mark_permalink_dirty(race)
 
         races_still_in_progress = await models.AsyncTournamentRace.filter(
             live_race=async_live_race,
@@ -1227,6 +1269,8 @@ class AsyncTournament(commands.GroupCog, name="async"):
             race.runner_notes = msg
 
         await race.save(update_fields=["status", "start_time", "end_time", "runner_vod_url", "runner_notes"])
+        update_race_deadlines(race)
+        asynctournament.mark_permalink_dirty(race)
 
         await interaction.response.send_message(msg)
 
@@ -1265,6 +1309,8 @@ async def finish_race(interaction: discord.Interaction):
     race.end_time = discord.utils.utcnow()
     race.status = "finished"
     await race.save()
+    update_race_deadlines(race)
+    asynctournament.mark_permalink_dirty(race)
 
     if race.tournament.customization == "gmpmt2023":
         await interaction.response.send_message(f"""
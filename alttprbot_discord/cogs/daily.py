@@ -1,12 +1,13 @@
 import logging
 
 import aiocache
-import aiohttp
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 
 from alttprbot import models
+from alttprbot.util import http
+from alttprbot_discord.util import guild_config
 from alttprbot_discord.util.alttpr_discord import ALTTPRDiscord
 
 
@@ -32,10 +33,10 @@ class Daily(commands.Cog):
             seed = await get_daily_seed(hash_id)
             embed = await seed.embed(emojis=self.bot.emojis,
                                      notes="This is today's daily challenge.  The latest challenge can always be found at https://alttpr.com/daily")
-            daily_announcer_channels = await models.Config.filter(parameter='DailyAnnouncerChannel')
-            for result in daily_announcer_channels:
-                guild = self.bot.get_guild(result.guild_id)
-                for channel_name in result.value.split(","):
+            daily_announcer_channels = guild_config.store.guilds_with('DailyAnnouncerChannel')
+            for guild_id, value in daily_announcer_channels.items():
+                guild = self.bot.get_guild(guild_id)
+                for channel_name in value.split(","):
                     channel = discord.utils.get(guild.text_channels, name=channel_name)
                     message: discord.Message = await channel.send(embed=embed)
                     await message.create_thread(name=seed.data['spoiler']['meta'].get('name'),
@@ -67,5 +68,6 @@ async def get_daily_seed(hash_id):
 
 @aiocache.cached(ttl=60, cache=aiocache.SimpleMemoryCache)
 async def find_daily_hash():
-    async with aiohttp.request(method='get', url='https://alttpr.com/api/daily', raise_for_status=True) as resp:
+    url = 'https://alttpr.com/api/daily'
+    async with http.get_session(url).request(method='get', url=url, raise_for_status=True) as resp:
         return await resp.json()
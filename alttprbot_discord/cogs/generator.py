@@ -5,11 +5,11 @@ import discord
 import pyz3r
 import yaml
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 from pyz3r.ext.priestmode import create_priestmode
 
 from alttprbot import models
-from alttprbot.alttprgen import generator, smvaria
+from alttprbot.alttprgen import generator, seedpool, smvaria
 from alttprbot.alttprgen.randomizer import smdash, z2r
 from alttprbot.alttprgen.spoilers import (generate_spoiler_game,
                                           generate_spoiler_game_custom)
@@ -33,6 +33,15 @@ ALTTPR_BRANCH_CHOICE = [
 class AlttprGenerator(commands.GroupCog, name="alttpr"):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
+        if seedpool.SEED_POOLS:
+            self.refill_seed_pools.start()  # pylint: disable=no-member
+
+    async def cog_unload(self):
+        self.refill_seed_pools.cancel()  # pylint: disable=no-member
+
+    @tasks.loop(minutes=1, reconnect=True)
+    async def refill_seed_pools(self):
+        await seedpool.refill_pools()
 
     @app_commands.command(name="preset", description="Generates an ALTTP Randomizer game on https://alttpr.com")
     @app_commands.describe(
@@ -58,13 +67,26 @@ class AlttprGenerator(commands.GroupCog, name="alttpr"):
             branch: str = "live",
     ):
         await interaction.response.defer()
-        seed = await generator.ALTTPRPreset(preset).generate(
+        seed = await seedpool.claim_alttpr(
+            preset,
+            branch=branch,
+            tournament=race == "yes",
             hints=hints == "yes",
             spoilers="off" if race == "yes" else "on",
-            tournament=race == "yes",
             allow_quickswap=allow_quickswap == "yes",
-            branch=branch,
         )
+        if seed is None:
+            async def send_queue_position(position):
+                await interaction.followup.send(f"The door randomizer is busy, your game is #{position} in the queue.")
+
+            seed = await generator.ALTTPRPreset(preset).generate(
+                hints=hints == "yes",
+                spoilers="off" if race == "yes" else "on",
+                tournament=race == "yes",
+                allow_quickswap=allow_quickswap == "yes",
+                branch=branch,
+                queue_callback=send_queue_position,
+            )
         if not seed:
             raise SahasrahBotException('Could not generate game.  Maybe preset does not exist?')
         embed = await seed.embed(emojis=self.bot.emojis)
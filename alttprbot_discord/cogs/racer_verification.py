@@ -1,20 +1,24 @@
+import asyncio
+import logging
 from datetime import datetime
 from datetime import timedelta
 from typing import List
 from io import StringIO
 
-import aiohttp
 import discord
-import isodate
 import pytz
 from discord import app_commands
 from discord.ext import commands, tasks
 
 import config
 from alttprbot import models
+from alttprbot.util import http, racetime_history
 
 RACETIME_URL = config.RACETIME_URL
 
+# how many members are reverified at once, racetime.gg requests are limited separately by racetime_history
+REVERIFY_CONCURRENCY = 10
+
 
 class RacerVerificationView(discord.ui.View):
     def __init__(self, bot: commands.Bot):
@@ -41,7 +45,9 @@ class RacerVerificationView(discord.ui.View):
                 ephemeral=True)
             return
 
-        eligible, count = await determine_eligibility(interaction.user.name, user, racer_verification)
+        # someone is waiting on the button, so stop counting once they qualify, the reverify job does the full count
+        eligible, count = await determine_eligibility(interaction.user.name, user, racer_verification,
+                                                      stop_at_minimum=True)
 
         if eligible:
             racer = await models.VerifiedRacer.get_or_none(
@@ -222,8 +228,13 @@ If you have any questions, please contact a server administrator.
         verified_racer_role = guild.get_role(racer_verification.role_id)
 
         revoked_users: List[models.VerifiedRacer] = []
+        semaphore = asyncio.Semaphore(REVERIFY_CONCURRENCY)
+
+        async def reverify_member(verified_racer_member: discord.Member):
+            async with semaphore:
+                await reverify_one(verified_racer_member)
 
-        for verified_racer_member in verified_racer_role.members:
+        async def reverify_one(verified_racer_member: discord.Member):
             # create database records if they don't already exist
             verified_racer_user, _ = await models.Users.get_or_create(
                 discord_user_id=verified_racer_member.id,
@@ -240,10 +251,10 @@ If you have any questions, please contact a server administrator.
             verified_racer.fetch_related('user')
 
             # check if they're required to reverify
-            if verified_racer.last_verified is not None and discord.utils.utcnow() - verified_racer.last_verified < datetime.timedelta(days=racer_verification.reverify_period_days):
+            if verified_racer.last_verified is not None and discord.utils.utcnow() - verified_racer.last_verified < timedelta(days=racer_verification.reverify_period_days):
                 # skip this racer as they're not due for reverification
-                continue
-            
+                return
+
             # check if they still meet the requirements
             eligible, count = await determine_eligibility(verified_racer_member.name, verified_racer_user, racer_verification)
 
@@ -263,43 +274,21 @@ If you have any questions, please contact a server administrator.
                         f"Your verification for __{verified_racer_role.name}__ has expired.  Please re-verify by clicking the button in the message in the {guild.name} server.\n\nIf you believe this is in error, please contact a server administrator for assistance."
                     )
 
+        results = await asyncio.gather(
+            *[reverify_member(m) for m in verified_racer_role.members],
+            return_exceptions=True
+        )
+        for member, result in zip(verified_racer_role.members, results):
+            if isinstance(result, Exception):
+                logging.error("Unable to reverify %s for racer verification %s: %s", member, racer_verification.id, result)
+
         return revoked_users
 
-async def get_racetime_count(racetime_id, category_slugs=None, days=365, max_count=1):
-    page = 1
-    count = 0
-    if category_slugs is None:
+async def get_racetime_count(racetime_id, category_slugs=None, days=365, enough=None):
+    if racetime_id is None or category_slugs is None:
         return 0
 
-    while count < max_count:
-        async with aiohttp.request(
-                method='get',
-                url=f'{RACETIME_URL}/user/{racetime_id}/races/data',
-                params={'page': page}
-        ) as resp:
-            try:
-                data = await resp.json()
-            except aiohttp.ContentTypeError:
-                break
-
-            if len(data['races']) == 0:
-                break
-
-            filtered_data = [x for x in data['races']
-                             if x['category']['slug'] in category_slugs
-                             and x['status']['value'] == 'finished'
-                             and tz_aware_greater_than(isodate.parse_datetime(x['opened_at']),
-                                                       datetime.datetime.utcnow() - datetime.timedelta(days=days))
-                             ]
-
-            count += len(filtered_data)
-
-            if page > data['num_pages']:
-                break
-
-        page += 1
-
-    return count
+    return await racetime_history.count_finished_races(racetime_id, category_slugs, days=days, enough=enough)
 
 
 def tz_aware_greater_than(dt1, dt2):
@@ -310,7 +299,7 @@ def tz_aware_greater_than(dt1, dt2):
     return dt1 > dt2
 
 async def get_ladder_guid(discord_username):
-    async with aiohttp.request(
+    async with http.get_session('https://alttprladder.com').request(
             method='get',
             url='https://alttprladder.com/api/v1/PublicAPI/GetActiveRacers',
             headers={'User-Agent': 'SahasrahBot'},
@@ -324,7 +313,7 @@ async def get_ladder_guid(discord_username):
 
 async def get_ladder_count(discord_username, days=365):
     racer_guid = await get_ladder_guid(discord_username)
-    async with aiohttp.request(
+    async with http.get_session('https://alttprladder.com').request(
             method='get',
             url=f'https://alttprladder.com/api/v1/PublicAPI/GetRacerHistory?RacerGUID={racer_guid}&flag_id=0',
             headers={'User-Agent': 'SahasrahBot'},
@@ -346,7 +335,7 @@ async def get_ladder_archive_count(discord_id, days=365):
     delta = timedelta(days=days)
     start = (now - delta).strftime('%m%d%Y')
     end = now.strftime('%m%d%Y')
-    async with aiohttp.request(
+    async with http.get_session('https://archive.alttprladder.com').request(
             method='get',
             url=f'https://archive.alttprladder.com/api/v1/PublicAPI/GetRacerRaceHistory?discordid={discord_id}&startdt={start}&enddt={end}',
             headers={'User-Agent': 'SahasrahBot'},
@@ -356,7 +345,8 @@ async def get_ladder_archive_count(discord_id, days=365):
 
     return data['TotalCount']
 
-async def determine_eligibility(username: str, user: models.Users, racer_verification: models.RacerVerification):
+async def determine_eligibility(username: str, user: models.Users, racer_verification: models.RacerVerification,
+                                stop_at_minimum: bool = False):
     try:
         rtgg_categories = racer_verification.racetime_categories.split(',')
     except AttributeError:
@@ -370,9 +360,9 @@ async def determine_eligibility(username: str, user: models.Users, racer_verific
          race_count += await get_ladder_archive_count(user.discord_user_id, days=racer_verification.time_period_days)
 
     if race_count < racer_verification.minimum_races:
+        enough = racer_verification.minimum_races - race_count if stop_at_minimum else None
         race_count += await get_racetime_count(user.rtgg_id, rtgg_categories,
-                                                days=racer_verification.time_period_days,
-                                                max_count=racer_verification.minimum_races)
+                                                days=racer_verification.time_period_days, enough=enough)
 
     return race_count >= racer_verification.minimum_races, race_count
 
@@ -1,10 +1,8 @@
-import json
-
-import aiohttp
 import discord
 from discord.ext import commands
 
 from alttprbot import models
+from alttprbot_racetime.misc.profiles import entrant_profiles
 
 
 # TODO: make work with discord.py 2.0
@@ -15,39 +13,49 @@ class RacetimeTools(commands.Cog):
         self.bot: commands.Bot = bot
 
     @commands.Cog.listener()
-    async def on_racetime_open(self, handler, data):
+    async def on_racetime_open(self, handler, diff):
         pass
 
     @commands.Cog.listener()
-    async def on_racetime_invitational(self, handler, data):
+    async def on_racetime_invitational(self, handler, diff):
         pass
 
     @commands.Cog.listener()
-    async def on_racetime_in_progress(self, handler, data):
-        await self.watchlisted_players(handler)
-        await self.new_players(handler)
+    async def on_racetime_in_progress(self, handler, diff):
+        entrant_ids = [a['user']['id'] for a in handler.data['entrants']]
+
+        watchlisted_players = await models.RTGGWatcherPlayer.filter(racetime_id__in=entrant_ids,
+                                                                    rtgg_watcher__category=handler.bot.category_slug).prefetch_related(
+            "rtgg_watcher")
+        new_player_watchers = await models.RTGGWatcher.filter(category=handler.bot.category_slug,
+                                                              notify_on_new_player=True)
+
+        # every watcher and both checks share a single fetch of each profile that's actually needed
+        if new_player_watchers:
+            wanted_ids = entrant_ids
+        else:
+            wanted_ids = [p.racetime_id for p in watchlisted_players]
+        profiles = await entrant_profiles.get_many(handler.bot, wanted_ids)
+
+        await self.watchlisted_players(handler, watchlisted_players, profiles)
+        await self.new_players(handler, new_player_watchers, profiles)
 
     @commands.Cog.listener()
-    async def on_racetime_cancelled(self, handler, data):
+    async def on_racetime_cancelled(self, handler, diff):
         pass
 
     @commands.Cog.listener()
-    async def on_racetime_finished(self, handler, data):
+    async def on_racetime_finished(self, handler, diff):
         pass
 
-    async def watchlisted_players(self, handler):
-        entrant_ids = [a['user']['id'] for a in handler.data['entrants']]
-        watchlisted_players = await models.RTGGWatcherPlayer.filter(racetime_id__in=entrant_ids,
-                                                                    rtgg_watcher__category=handler.bot.category_slug).prefetch_related(
-            "rtgg_watcher")
+    async def watchlisted_players(self, handler, watchlisted_players, profiles):
+        race_room_uri = handler.bot.http_uri(handler.data['url'])
         for watchlisted_player in watchlisted_players:
-            channel = self.bot.get_channel(watchlisted_player.rtgg_watcher.channel_id)
-            player_data_uri = handler.bot.http_uri(f"/user/{watchlisted_player.racetime_id}/data")
-            race_room_uri = handler.bot.http_uri(handler.data['url'])
-
-            async with aiohttp.request(method='get', url=player_data_uri, raise_for_status=True) as resp:
-                user_data = json.loads(await resp.read())
+            user_data = profiles.get(watchlisted_player.racetime_id)
+            if user_data is None:
+                continue
 
+            channel = self.bot.get_channel(watchlisted_player.rtgg_watcher.channel_id)
             player_profile_uri = handler.bot.http_uri(user_data['url'])
 
             embed = discord.Embed(
@@ -57,28 +65,23 @@ class RacetimeTools(commands.Cog):
             )
             await channel.send(embed=embed)
 
-    async def new_players(self, handler):
-        entrant_ids = [a['user']['id'] for a in handler.data['entrants']]
-        watchers = await models.RTGGWatcher.filter(category=handler.bot.category_slug)
+    async def new_players(self, handler, watchers, profiles):
+        new_racers = [user_data for user_data in profiles.values() if user_data['stats']['joined'] == 0]
+        if not new_racers:
+            return
+
+        race_room_uri = handler.bot.http_uri(handler.data['url'])
         for watcher in watchers:
             channel = self.bot.get_channel(watcher.channel_id)
-            if not watcher.notify_on_new_player:
-                continue
 
-            for entrant in entrant_ids:
-                player_data_uri = handler.bot.http_uri(f"/user/{entrant}/data")
-                async with aiohttp.request(method='get', url=player_data_uri, raise_for_status=True) as resp:
-                    user_data = json.loads(await resp.read())
-                    player_profile_uri = handler.bot.http_uri(user_data['url'])
-                    race_room_uri = handler.bot.http_uri(handler.data['url'])
-
-                    if user_data['stats']['joined'] == 0:
-                        embed = discord.Embed(
-                            title="New Racer Detected!",
-                            description=f"A new racer named [{user_data['full_name']}]({player_profile_uri}) began racing in [{handler.data.get('name')}]({race_room_uri})",
-                            color=discord.Colour.green()
-                        )
-                        await channel.send(embed=embed)
+            for user_data in new_racers:
+                player_profile_uri = handler.bot.http_uri(user_data['url'])
+                embed = discord.Embed(
+                    title="New Racer Detected!",
+                    description=f"A new racer named [{user_data['full_name']}]({player_profile_uri}) began racing in [{handler.data.get('name')}]({race_room_uri})",
+                    color=discord.Colour.green()
+                )
+                await channel.send(embed=embed)
 
 
 async def setup(bot):
@@ -1,7 +1,10 @@
+import asyncio
 import datetime
 import logging
 import random
+import time
 
+import dateutil.parser
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
@@ -12,8 +15,12 @@ from alttprbot import models
 from alttprbot import tournaments
 from alttprbot.tournament import core, alttpr
 from alttprbot.util import speedgaming
+from alttprbot_discord.util import guild_config
 
-# TODO: use asyncio.semaphore() to limit the number of concurrent tasks
+# limits on how many race rooms may be created at once, both overall and for a single event, so one slow event
+# can't hold up room creation for everyone else
+MAX_CONCURRENT_ROOM_CREATIONS = 10
+MAX_CONCURRENT_ROOM_CREATIONS_PER_EVENT = 3
 
 MAIN_TOURNAMENT_SERVERS = list(map(int, config.MAIN_TOURNAMENT_SERVERS.split(',')))
 CC_TOURNAMENT_SERVERS = list(map(int, config.CC_TOURNAMENT_SERVERS.split(',')))
@@ -73,6 +80,7 @@ class Tournament(commands.Cog):
         self.week_races.start()
         self.find_races_with_bad_discord.start()
         self.persistent_views_added = False
+        self.room_creation_semaphore = asyncio.Semaphore(MAX_CONCURRENT_ROOM_CREATIONS)
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -84,17 +92,11 @@ class Tournament(commands.Cog):
     async def create_races(self):
         try:
             logging.info("scanning SG schedule for tournament races to create")
-            for event_slug, tournament_class in tournaments.TOURNAMENT_DATA.items():
-                event_data: core.TournamentConfig = await tournament_class.get_config()
-                try:
-                    episodes = await speedgaming.get_upcoming_episodes_by_event(event_slug, hours_past=0.5,
-                                                                                hours_future=event_data.hours_before_room_open)
-                except Exception:
-                    logging.exception("Encountered a problem when attempting to retrieve SG schedule.")
-                    continue
-                for episode in episodes:
-                    logging.info(episode['id'])
-                    await self.create_race_room(event_data, event_slug, episode)
+            await asyncio.gather(
+                *[self.create_event_races(event_slug, tournament_class) for event_slug, tournament_class in
+                  tournaments.TOURNAMENT_DATA.items()],
+                return_exceptions=True
+            )
         except Exception:
             logging.exception("An error occured while processing create_races.")
         logging.info('done')
@@ -168,10 +170,7 @@ class Tournament(commands.Cog):
         if ctx.guild is None:
             return False
 
-        if await ctx.guild.config_get('TournamentEnabled') == 'true':
-            return True
-        else:
-            return False
+        return guild_config.store.get_bool(ctx.guild.id, 'TournamentEnabled')
 
     async def update_scheduled_event(self, event_data: core.TournamentRace, event_slug: str, episodes: dict):
 
@@ -339,9 +338,28 @@ class Tournament(commands.Cog):
         except Exception:
             logging.exception("Unable to update scheduling needs channel.")
 
+    async def create_event_races(self, event_slug, tournament_class):
+        try:
+            event_data: core.TournamentConfig = await tournament_class.get_config()
+            episodes = await speedgaming.get_upcoming_episodes_by_event(event_slug, hours_past=0.5,
+                                                                        hours_future=event_data.hours_before_room_open)
+        except Exception:
+            logging.exception("Encountered a problem when attempting to retrieve SG schedule.")
+            return
+
+        event_semaphore = asyncio.Semaphore(MAX_CONCURRENT_ROOM_CREATIONS_PER_EVENT)
+
+        async def create_with_limits(episode):
+            async with event_semaphore, self.room_creation_semaphore:
+                await self.create_race_room(event_data, event_slug, episode)
+
+        await asyncio.gather(*[create_with_limits(episode) for episode in episodes], return_exceptions=True)
+
     async def create_race_room(self, event_data, event_slug, episode):
+        logging.info(episode['id'])
+        started = time.monotonic()
         try:
-            await tournaments.create_tournament_race_room(event_slug, episode['id'])
+            handler = await tournaments.create_tournament_race_room(event_slug, episode['id'])
         except Exception as e:
             logging.exception(
                 "Encountered a problem when attempting to create RT.gg race room.")
@@ -350,6 +368,18 @@ class Tournament(commands.Cog):
                     f"There was an error while automatically creating a race room for episode `{episode['id']}`.\n\n{str(e)}",
                     allowed_mentions=discord.AllowedMentions(everyone=True)
                 )
+            return
+
+        if handler is None:
+            # room already existed
+            return
+
+        # how late the room opened compared to when it should have, based on the event's room open time
+        start_time = dateutil.parser.parse(episode['whenCountdown'])
+        target_open_time = start_time - datetime.timedelta(hours=event_data.hours_before_room_open)
+        latency = datetime.datetime.now(tz=datetime.timezone.utc) - target_open_time
+        logging.info("Opened room for %s episode %s in %.1fs, %.0fs after the target room open time.",
+                     event_slug, episode['id'], time.monotonic() - started, latency.total_seconds())
 
     async def send_race_form(self, event_data, event_slug, episode):
         try:
@@ -1,48 +1,86 @@
-import aiocache
-import tortoise.exceptions
+from typing import Dict, List, Optional
+
 from discord.guild import Guild
 
 from alttprbot import models
 
-CACHE = aiocache.Cache(aiocache.SimpleMemoryCache)
+
+class GuildConfigStore:
+    """
+    In-memory copy of the config table, loaded once at startup.
+
+    Reads are served straight from memory, writes go to the database first and then update the copy here.  Anything
+    that changes the config table needs to go through this store, or call load() again afterwards.
+    """
+
+    def __init__(self):
+        self._by_guild: Dict[int, Dict[str, Optional[str]]] = {}
+        self._by_parameter: Dict[str, Dict[int, Optional[str]]] = {}
+        self.loaded = False
+
+    async def load(self):
+        by_guild: Dict[int, Dict[str, Optional[str]]] = {}
+        by_parameter: Dict[str, Dict[int, Optional[str]]] = {}
+
+        # if a parameter was somehow saved twice for a guild, the oldest row wins
+        rows = await models.Config.all().order_by('id').values_list('guild_id', 'parameter', 'value')
+        for guild_id, parameter, value in rows:
+            by_guild.setdefault(guild_id, {}).setdefault(parameter, value)
+            by_parameter.setdefault(parameter, {}).setdefault(guild_id, value)
+
+        self._by_guild = by_guild
+        self._by_parameter = by_parameter
+        self.loaded = True
+
+    def get(self, guild_id: int, parameter: str, default=None) -> Optional[str]:
+        return self._by_guild.get(guild_id, {}).get(parameter, default)
+
+    def get_bool(self, guild_id: int, parameter: str, default: bool = False) -> bool:
+        value = self.get(guild_id, parameter)
+        if value is None:
+            return default
+        return value == 'true'
+
+    def get_all(self, guild_id: int) -> Dict[str, Optional[str]]:
+        return dict(self._by_guild.get(guild_id, {}))
+
+    def guilds_with(self, parameter: str) -> Dict[int, Optional[str]]:
+        """
+        Returns the value of parameter for every guild that has it set, keyed by guild id.
+        """
+        return dict(self._by_parameter.get(parameter, {}))
+
+    async def set(self, guild_id: int, parameter: str, value: Optional[str]):
+        await models.Config.update_or_create(guild_id=guild_id, parameter=parameter, defaults={'value': value})
+        self._by_guild.setdefault(guild_id, {})[parameter] = value
+        self._by_parameter.setdefault(parameter, {})[guild_id] = value
+
+    async def delete(self, guild_id: int, parameter: str):
+        await models.Config.filter(guild_id=guild_id, parameter=parameter).delete()
+        self._by_guild.get(guild_id, {}).pop(parameter, None)
+        self._by_parameter.get(parameter, {}).pop(guild_id, None)
+
+
+store = GuildConfigStore()
 
 
 async def config_set(self, parameter, value):
-    await models.Config.update_or_create(guild_id=self.id, parameter=parameter, defaults={'value': value})
-    await CACHE.delete(f'{parameter}_{self.id}_config')
-    await CACHE.delete(f'{self.id}_guildconfig')
+    await store.set(self.id, parameter, value)
 
 
 async def config_get(self, parameter, default=None):
-    if await CACHE.exists(f'{parameter}_{self.id}_config'):
-        value = await CACHE.get(f'{parameter}_{self.id}_config')
-        return value
-
-    try:
-        result = await models.Config.get(guild_id=self.id, parameter=parameter)
-        await CACHE.set(f'{parameter}_{self.id}_config', result.value)
-        await CACHE.delete(f'{self.id}_guildconfig')
-        return result.value
-    except tortoise.exceptions.DoesNotExist:
-        await CACHE.set(f'{parameter}_{self.id}_config', default)
-        await CACHE.delete(f'{self.id}_guildconfig')
-        return default
+    return store.get(self.id, parameter, default)
 
 
 async def config_delete(self, parameter):
-    await models.Config.filter(guild_id=self.id, parameter=parameter).delete()
-    await CACHE.delete(f'{parameter}_{self.id}_config')
-    await CACHE.delete(f'{self.id}_guildconfig')
-
+    await store.delete(self.id, parameter)
 
-async def config_list(self):
-    if await CACHE.exists(f'{self.id}_guildconfig'):
-        values = await CACHE.get(f'{self.id}_guildconfig')
-        return values
 
-    values = await models.Config.filter(guild_id=self.id).values()
-    await CACHE.set(f'{self.id}_guildconfig', values)
-    return values
+async def config_list(self) -> List[dict]:
+    return [
+        {'guild_id': self.id, 'parameter': parameter, 'value': value}
+        for parameter, value in store.get_all(self.id).items()
+    ]
 
 
 def init():
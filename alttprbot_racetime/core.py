@@ -1,4 +1,8 @@
+import asyncio
 import ssl
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 
 import aiohttp
 from racetime_bot import Bot
@@ -12,6 +16,20 @@ RACETIME_HOST = config.RACETIME_HOST
 RACETIME_SECURE = config.RACETIME_SECURE
 RACETIME_PORT = config.RACETIME_PORT
 
+# how many rooms are fetched and joined at once when the bot starts up
+RACETIME_RESUME_CONCURRENCY = 10
+
+# how long preloaded room data is kept around for handlers to pick up, in seconds
+RESUME_DATA_TTL = 300
+
+
+@dataclass
+class RoomResumeData:
+    tournament_result: Optional[models.TournamentResults] = None
+    konot_segment: Optional[models.RaceTimeKONOTSegment] = None
+    konot_game: Optional[models.RacetimeKONOTGame] = None
+    spoiler_race: Optional[models.SpoilerRaces] = None
+
 
 class SahasrahBotRaceTimeBot(Bot):
     racetime_host = RACETIME_HOST
@@ -21,6 +39,7 @@ class SahasrahBotRaceTimeBot(Bot):
     def __init__(self, handler_class, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.handler_class = handler_class
+        self.resume_data: Dict[str, RoomResumeData] = {}
         if self.racetime_secure:
             self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
 
@@ -39,11 +58,72 @@ class SahasrahBotRaceTimeBot(Bot):
         self.http = aiohttp.ClientSession(raise_for_status=True)
         self.access_token, self.reauthorize_every = await self.authorize()
         self.loop.create_task(self.reauthorize())
-        self.loop.create_task(self.refresh_races())
 
+        started = time.monotonic()
+
+        # load what the resumed handlers will need up front, before refresh_races starts creating them
         unlisted_rooms = await models.RTGGUnlistedRooms.filter(category=self.category_slug)
-        for unlisted_room in unlisted_rooms:
-            try:
+        listed_room_names = await self.get_listed_room_names()
+        await self.load_resume_data(listed_room_names + [r.room_name for r in unlisted_rooms])
+
+        self.loop.create_task(self.refresh_races())
+        resumed = await self.resume_unlisted_rooms(unlisted_rooms)
+
+        self.logger.info(
+            "Resumed %s unlisted rooms and preloaded %s rooms for %s in %.1fs",
+            resumed, len(self.resume_data), self.category_slug, time.monotonic() - started
+        )
+
+    async def get_listed_room_names(self) -> List[str]:
+        try:
+            async with self.http.get(self.http_uri(f'/{self.category_slug}/data'), ssl=self.ssl_context) as resp:
+                data = await resp.json()
+        except aiohttp.ClientError:
+            self.logger.exception("Unable to retrieve current races for %s", self.category_slug)
+            return []
+
+        return [race['name'] for race in data.get('current_races', [])]
+
+    async def load_resume_data(self, room_names: List[str]):
+        """
+        Loads the tournament, KONOT and spoiler race rows for every room with one query per table.
+        """
+        if not room_names:
+            return
+
+        tournament_results = {
+            r.srl_id: r for r in await models.TournamentResults.filter(srl_id__in=room_names)
+        }
+        konot_segments = {
+            s.racetime_room: s for s in await models.RaceTimeKONOTSegment.filter(racetime_room__in=room_names)
+        }
+        konot_games = {
+            g.id: g for g in await models.RacetimeKONOTGame.filter(id__in=[s.game_id for s in konot_segments.values()])
+        } if konot_segments else {}
+        spoiler_races = {
+            s.srl_id: s for s in await models.SpoilerRaces.filter(srl_id__in=room_names)
+        }
+
+        for room_name in room_names:
+            segment = konot_segments.get(room_name)
+            self.resume_data[room_name] = RoomResumeData(
+                tournament_result=tournament_results.get(room_name),
+                konot_segment=segment,
+                konot_game=konot_games.get(segment.game_id) if segment else None,
+                spoiler_race=spoiler_races.get(room_name),
+            )
+
+        # anything not picked up by a handler by now is stale
+        self.loop.call_later(RESUME_DATA_TTL, self.resume_data.clear)
+
+    def pop_resume_data(self, room_name) -> Optional[RoomResumeData]:
+        return self.resume_data.pop(room_name, None)
+
+    async def resume_unlisted_rooms(self, unlisted_rooms: List[models.RTGGUnlistedRooms]) -> int:
+        semaphore = asyncio.Semaphore(RACETIME_RESUME_CONCURRENCY)
+
+        async def fetch_room_data(unlisted_room: models.RTGGUnlistedRooms):
+            async with semaphore:
                 async for attempt in AsyncRetrying(
                         stop=stop_after_attempt(5),
                         retry=retry_if_exception_type(aiohttp.ClientResponseError)):
@@ -52,12 +132,34 @@ class SahasrahBotRaceTimeBot(Bot):
                                 self.http_uri(f'/{unlisted_room.room_name}/data'),
                                 ssl=self.ssl_context,
                         ) as resp:
-                            race_data = await resp.json()
+                            return await resp.json()
+
+        results = await asyncio.gather(*[fetch_room_data(r) for r in unlisted_rooms], return_exceptions=True)
+
+        stale_ids = []
+        to_join = []
+        for unlisted_room, race_data in zip(unlisted_rooms, results):
+            if isinstance(race_data, RetryError):
+                race_data = race_data.last_attempt.exception()
+            if isinstance(race_data, Exception):
+                self.logger.error("Unable to resume %s: %s", unlisted_room.room_name, race_data)
+                continue
+
+            if race_data['status']['value'] in ['finished', 'cancelled'] or not race_data['unlisted']:
+                stale_ids.append(unlisted_room.id)
+            else:
+                to_join.append(unlisted_room.room_name)
+
+        if stale_ids:
+            await models.RTGGUnlistedRooms.filter(id__in=stale_ids).delete()
+
+        async def join(room_name):
+            async with semaphore:
+                await self.join_race_room(room_name)
 
-                if race_data['status']['value'] in ['finished', 'cancelled'] or not race_data['unlisted']:
-                    await unlisted_room.delete()
-                else:
-                    await self.join_race_room(unlisted_room.room_name)
+        joined = await asyncio.gather(*[join(room_name) for room_name in to_join], return_exceptions=True)
+        for room_name, result in zip(to_join, joined):
+            if isinstance(result, Exception):
+                self.logger.error("Unable to join %s: %s", room_name, result)
 
-            except RetryError as e:
-                raise e.last_attempt._exception from e
+        return len([r for r in joined if not isinstance(r, Exception)])
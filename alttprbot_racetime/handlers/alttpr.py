@@ -1,6 +1,6 @@
 from racetime_bot import monitor_cmd, msg_actions
 
-from alttprbot.alttprgen import preset, spoilers, generator
+from alttprbot.alttprgen import preset, spoilers, generator, seedpool
 from .core import SahasrahBotCoreHandler
 
 
@@ -243,14 +243,20 @@ class GameHandler(SahasrahBotCoreHandler):
         else:
             await self.send_message("Generating game, please wait.  If nothing happens after a minute, contact Synack.")
             try:
-                seed = await generator.ALTTPRPreset(preset_name).generate(
-                    hints=hints,
-                    spoilers="off",
-                    tournament=True,
-                    allow_quickswap=allow_quickswap,
-                    endpoint_prefix="/festive" if festive else "",
-                    branch=branch,
-                )
+                seed = None
+                if not festive:
+                    seed = await seedpool.claim_alttpr(preset_name, branch=branch, hints=hints,
+                                                       allow_quickswap=allow_quickswap)
+                if seed is None:
+                    seed = await generator.ALTTPRPreset(preset_name).generate(
+                        hints=hints,
+                        spoilers="off",
+                        tournament=True,
+                        allow_quickswap=allow_quickswap,
+                        endpoint_prefix="/festive" if festive else "",
+                        branch=branch,
+                        queue_callback=self.send_queue_position,
+                    )
             except preset.PresetNotFoundException as e:
                 await self.send_message(str(e))
                 return
@@ -270,7 +276,8 @@ class GameHandler(SahasrahBotCoreHandler):
 
         await self.send_message("Generating game, please wait.  If nothing happens after a minute, contact Synack.")
         try:
-            mystery = await generator.ALTTPRMystery(weightset).generate(tournament=True, spoilers="mystery")
+            mystery = await generator.ALTTPRMystery(weightset).generate(tournament=True, spoilers="mystery",
+                                                                        queue_callback=self.send_queue_position)
             seed = mystery.seed
         except generator.WeightsetNotFoundException as e:
             await self.send_message(str(e))
@@ -287,6 +294,9 @@ class GameHandler(SahasrahBotCoreHandler):
         await self.send_message("Seed rolling complete.  See race info for details.")
         self.seed_rolled = True
 
+    async def send_queue_position(self, position):
+        await self.send_message(f"The door randomizer is busy, this game is #{position} in the queue.")
+
     # TODO: refactor this pile of shit
     @monitor_cmd
     async def ex_cancel(self, args, message):
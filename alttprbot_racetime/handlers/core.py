@@ -1,7 +1,9 @@
 import asyncio
 import math
 from datetime import datetime
+from functools import partial
 from itertools import groupby
+from typing import Set
 
 import discord.utils
 import tortoise.exceptions
@@ -10,7 +12,20 @@ from racetime_bot import RaceHandler, can_monitor, monitor_cmd
 from alttprbot import models
 from alttprbot import tournaments
 from alttprbot_discord.bot import discordbot
+from alttprbot_racetime.core import RoomResumeData
 from alttprbot_racetime.misc.konot import KONOT
+from alttprbot_racetime.misc.racediff import RaceDataDiff, diff_race_data, entrant_status
+from alttprbot_racetime.misc.timers import room_timers
+
+COUNTDOWN_REMINDERS = [1800, 1500, 1200, 900, 600, 300, 120, 60, 30, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1]
+
+
+def countdown_message(timeleft):
+    minutes = math.floor(timeleft / 60)
+    seconds = math.ceil(timeleft % 60)
+    if minutes == 0:
+        return f'{seconds} second(s) remain!'
+    return f'{minutes} minute(s), {seconds} seconds remain!'
 
 
 class SahasrahBotCoreHandler(RaceHandler):
@@ -23,10 +38,13 @@ class SahasrahBotCoreHandler(RaceHandler):
     status = None
     unlisted = False
     spoiler_race: models.SpoilerRaces = None
+    previous_race_data: dict = None
+    gatekeeping_tournament = None
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.seed_rolled = False
+        self.countdowns: Set[asyncio.Future] = set()
 
     async def begin(self):
         self.state['locked'] = False
@@ -34,15 +52,23 @@ class SahasrahBotCoreHandler(RaceHandler):
         if self.data.get('status', {}).get('value') in ['open', 'invitational']:
             await self.intro()
 
-        await self.setup_tournament()
-        await self.setup_konot()
-        await self.setup_spoiler_race()
+        # when the bot has just started, these rows were already loaded for every room in one go
+        resume = self.bot.pop_resume_data(self.data.get('name'))
 
-    async def setup_spoiler_race(self):
-        self.spoiler_race = await models.SpoilerRaces.get_or_none(
-            srl_id=self.data.get('name')
+        await asyncio.gather(
+            self.setup_tournament(resume),
+            self.setup_konot(resume),
+            self.setup_spoiler_race(resume),
         )
 
+    async def setup_spoiler_race(self, resume: RoomResumeData = None):
+        if resume:
+            self.spoiler_race = resume.spoiler_race
+        else:
+            self.spoiler_race = await models.SpoilerRaces.get_or_none(
+                srl_id=self.data.get('name')
+            )
+
         if self.spoiler_race is None:
             return
         if self.spoiler_race.started is None:
@@ -55,6 +81,8 @@ class SahasrahBotCoreHandler(RaceHandler):
         if remaining_duration <= 0:
             return
 
+        # anything scheduled before the room was resumed belongs to the old handler
+        self.cancel_timers()
         loop = asyncio.get_running_loop()
         loop.create_task(self.countdown_timer(
             duration_in_seconds=remaining_duration,
@@ -79,33 +107,37 @@ class SahasrahBotCoreHandler(RaceHandler):
         ))
 
     async def countdown_timer(self, duration_in_seconds, beginmessage=False):
-        loop = asyncio.get_running_loop()
+        """
+        Posts reminders as the countdown runs down, and returns once it's over.
 
-        reminders = [1800, 1500, 1200, 900, 600, 300,
-                     120, 60, 30, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1]
-        start_time = loop.time()
+        Each reminder is its own callback on the shared room timers, this coroutine just waits for the last one.
+        """
+        loop = asyncio.get_running_loop()
+        room = self.data.get('name')
         end_time = loop.time() + duration_in_seconds
-        while True:
-            # logging.info(datetime.datetime.now())
-            timeleft = math.ceil(
-                start_time - loop.time() + duration_in_seconds)
-            # logging.info(timeleft)
-            if timeleft in reminders:
-                minutes = math.floor(timeleft / 60)
-                seconds = math.ceil(timeleft % 60)
-                if minutes == 0 and seconds > 10:
-                    msg = f'{seconds} second(s) remain!'
-                elif minutes == 0 and seconds <= 10:
-                    msg = f"{seconds} second(s) remain!"
-                else:
-                    msg = f'{minutes} minute(s), {seconds} seconds remain!'
-                await self.send_message(msg)
-                reminders.remove(timeleft)
-            if loop.time() >= end_time:
-                if beginmessage:
-                    await self.send_message('Log study has finished.  Begin racing!')
-                break
-            await asyncio.sleep(.1 if timeleft <= 10 else 1)
+        finished = loop.create_future()
+        self.countdowns.add(finished)
+        finished.add_done_callback(self.countdowns.discard)
+
+        for reminder in COUNTDOWN_REMINDERS:
+            if reminder > math.ceil(duration_in_seconds):
+                continue
+            room_timers.schedule(room, end_time - reminder, f"{reminder} second reminder",
+                                 partial(self.send_message, countdown_message(reminder)))
+
+        async def finish():
+            if beginmessage:
+                await self.send_message('Log study has finished.  Begin racing!')
+            if not finished.done():
+                finished.set_result(None)
+
+        room_timers.schedule(room, end_time, "countdown finished", finish)
+        await finished
+
+    def cancel_timers(self):
+        room_timers.cancel(self.data.get('name'))
+        for countdown in list(self.countdowns):
+            countdown.cancel()
 
     async def schedule_spoiler_race(self, spoiler_url: str, studytime: int):
         self.spoiler_race, _ = await models.SpoilerRaces.update_or_create(
@@ -121,12 +153,16 @@ class SahasrahBotCoreHandler(RaceHandler):
         if self.spoiler_race:
             await self.spoiler_race.delete()
         self.spoiler_race = None
+        self.cancel_timers()
 
-    async def setup_tournament(self):
+    async def setup_tournament(self, resume: RoomResumeData = None):
         if self.tournament:
             return
 
-        race = await models.TournamentResults.get_or_none(srl_id=self.data.get('name'))
+        if resume:
+            race = resume.tournament_result
+        else:
+            race = await models.TournamentResults.get_or_none(srl_id=self.data.get('name'))
         if not race:
             return
 
@@ -140,10 +176,15 @@ class SahasrahBotCoreHandler(RaceHandler):
         except Exception:
             self.logger.exception("Error while association tournament race to handler.")
 
-    async def setup_konot(self):
+    async def setup_konot(self, resume: RoomResumeData = None):
         if self.konot:
             return
 
+        if resume:
+            if resume.konot_segment and resume.konot_game:
+                self.konot = KONOT.resume_from(self, resume.konot_segment, resume.konot_game)
+            return
+
         try:
             self.konot = await KONOT.resume(self)
         except tortoise.exceptions.DoesNotExist:
@@ -152,48 +193,57 @@ class SahasrahBotCoreHandler(RaceHandler):
     async def race_data(self, data):
         self.data = data.get('race')
 
-        await self.race_data_hook()
+        diff = diff_race_data(self.previous_race_data, self.data)
+        self.previous_race_data = self.data
 
-        if self.tournament:
-            pending_entrants = [e for e in self.data['entrants'] if e.get('status', {}).get('value', {}) == 'requested']
+        # a tournament attached since the last update hasn't seen the entrants that were already waiting
+        tournament_attached = self.tournament is not self.gatekeeping_tournament
+        self.gatekeeping_tournament = self.tournament
+
+        if diff.empty and not tournament_attached:
+            return
+
+        await self.race_data_hook(diff)
+
+        # everyone still waiting is checked again, since the player list or gatekeepers may have changed since they
+        # asked to join, can_gatekeep is cached so this stays cheap
+        pending_entrants = [e for e in self.data['entrants'] if entrant_status(e) == 'requested']
+        if self.tournament and pending_entrants:
+            player_racetime_ids = set(self.tournament.player_racetime_ids)
             for entrant in pending_entrants:
                 entrant_id = entrant['user']['id']
 
-                if entrant_id in self.tournament.player_racetime_ids:
+                if entrant_id in player_racetime_ids:
                     await self.accept_request(entrant_id)
 
                 elif await self.tournament.can_gatekeep(entrant_id):
                     await self.accept_request(entrant_id)
                     await self.add_monitor(entrant_id)
 
-        fire_event = False
-
-        status = self.data.get('status', {}).get('value')
-        if status != self.status and self.status is not None:
-            fire_event = True
-
-        self.status = status
-        if fire_event:
+        if diff.race_status:
+            old_status, status = diff.race_status
             self.status = status
-            method = f'status_{status}'
 
-            discordbot.dispatch(f"racetime_{status}", self, data)
+            if old_status is not None:
+                method = f'status_{status}'
+
+                discordbot.dispatch(f"racetime_{status}", self, diff)
 
-            if hasattr(self, method):
-                self.logger.debug('[%(race)s] Calling status handler for %(status)s' % {
-                    'race': self.data.get('name'),
-                    'status': status,
-                })
-                await getattr(self, method)()
+                if hasattr(self, method):
+                    self.logger.debug('[%(race)s] Calling status handler for %(status)s' % {
+                        'race': self.data.get('name'),
+                        'status': status,
+                    })
+                    await getattr(self, method)()
 
-        unlisted = self.data.get('unlisted', False)
-        if unlisted != self.unlisted:
+        if 'unlisted' in diff.settings:
+            unlisted = self.data.get('unlisted', False)
             if unlisted:
                 await models.RTGGUnlistedRooms.update_or_create(room_name=self.data.get('name'),
                                                                 defaults={'category': self.bot.category_slug})
-            else:
+            elif self.unlisted:
                 await models.RTGGUnlistedRooms.filter(room_name=self.data.get('name')).delete()
-        self.unlisted = unlisted
+            self.unlisted = unlisted
 
     # TODO: this should be implemented in the base class
     async def override_stream(self, user):
@@ -236,7 +286,10 @@ class SahasrahBotCoreHandler(RaceHandler):
         if self.konot:
             await self.konot.create_next_room()
 
-    async def race_data_hook(self):
+    async def race_data_hook(self, diff: RaceDataDiff):
+        """
+        Called with what changed whenever a race.data message actually changes something.
+        """
         pass
 
     async def intro(self):
@@ -250,6 +303,7 @@ class SahasrahBotCoreHandler(RaceHandler):
             self.state['intro_sent'] = True
 
     async def end(self):
+        self.cancel_timers()
         # await self.send_message(f"SahasrahBot is now leaving this race room.  Have a great day!")
         self.logger.info(f"Leaving race room {self.data.get('name')}")
 
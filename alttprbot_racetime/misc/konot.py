@@ -25,6 +25,13 @@ class KONOT(object):
         konot.game = await models.RacetimeKONOTGame.get(id=konot.segment.game_id)
         return konot
 
+    @classmethod
+    def resume_from(cls, rtgg_handler, segment: models.RaceTimeKONOTSegment, game: models.RacetimeKONOTGame):
+        konot = cls(rtgg_handler)
+        konot.segment = segment
+        konot.game = game
+        return konot
+
     @classmethod
     async def next_segment(cls, rtgg_handler, game: models.RacetimeKONOTGame, segment_number):
         konot = cls(rtgg_handler)
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Iterable, Tuple
+
+from alttprbot.util import http
+
+# racetime.gg profiles barely change between back to back races, so a few minutes is plenty
+PROFILE_CACHE_TTL = 300
+PROFILE_FETCH_CONCURRENCY = 10
+
+
+class EntrantProfiles:
+    """
+    Fetches racetime.gg user profiles, each one at most once per TTL no matter how many callers ask for it.
+    """
+
+    def __init__(self, ttl: int, concurrency: int):
+        self.ttl = ttl
+        self._cache: Dict[str, Tuple[dict, float]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def _fetch(self, bot, racetime_id: str) -> dict:
+        async with self._semaphore:
+            url = bot.http_uri(f"/user/{racetime_id}/data")
+            async with http.get_session(url).request(method='get', url=url, raise_for_status=True) as resp:
+                profile = json.loads(await resp.read())
+
+        # new racers aren't cached, their race count has to be current for the new racer check to fire only once
+        if profile.get('stats', {}).get('joined', 0) > 0:
+            self._cache[racetime_id] = (profile, time.monotonic() + self.ttl)
+        return profile
+
+    async def get(self, bot, racetime_id: str) -> dict:
+        cached = self._cache.get(racetime_id)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+
+        # share a fetch that's already under way rather than starting another one
+        task = self._inflight.get(racetime_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(bot, racetime_id))
+            self._inflight[racetime_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(racetime_id, None))
+
+        return await asyncio.shield(task)
+
+    async def get_many(self, bot, racetime_ids: Iterable[str]) -> Dict[str, dict]:
+        """
+        Returns profiles keyed by racetime id.  Profiles that couldn't be fetched are left out.
+        """
+        self._prune()
+
+        racetime_ids = list(dict.fromkeys(racetime_ids))
+        results = await asyncio.gather(*[self.get(bot, r) for r in racetime_ids], return_exceptions=True)
+
+        profiles = {}
+        for racetime_id, result in zip(racetime_ids, results):
+            if isinstance(result, Exception):
+                logging.warning("Unable to fetch racetime.gg profile for %s: %s", racetime_id, result)
+                continue
+            profiles[racetime_id] = result
+        return profiles
+
+    def _prune(self):
+        now = time.monotonic()
+        for racetime_id in [k for k, v in self._cache.items() if v[1] <= now]:
+            del self._cache[racetime_id]
+
+
+entrant_profiles = EntrantProfiles(ttl=PROFILE_CACHE_TTL, concurrency=PROFILE_FETCH_CONCURRENCY)
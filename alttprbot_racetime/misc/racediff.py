@@ -0,0 +1,65 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# race data keys that change on every update, or are covered by the entrant and status diffs
+IGNORED_KEYS = ['entrants', 'status', 'version', 'entrants_count', 'entrants_count_finished', 'entrants_count_inactive']
+
+
+@dataclass
+class EntrantStatusChange:
+    entrant: dict
+    old: Optional[str]
+    new: str
+
+
+@dataclass
+class RaceDataDiff:
+    """
+    What changed between two race.data messages for the same room.
+    """
+    added: List[dict] = field(default_factory=list)
+    removed: List[dict] = field(default_factory=list)
+    status_changes: List[EntrantStatusChange] = field(default_factory=list)
+    race_status: Optional[Tuple[Optional[str], str]] = None
+    settings: Dict[str, Tuple[Any, Any]] = field(default_factory=dict)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.status_changes or self.race_status or self.settings)
+
+
+def entrant_status(entrant: dict) -> Optional[str]:
+    return entrant.get('status', {}).get('value')
+
+
+def diff_race_data(previous: Optional[dict], current: dict) -> RaceDataDiff:
+    """
+    Compares two race.data payloads.  With no previous payload, every entrant counts as added.
+    """
+    diff = RaceDataDiff()
+    previous = previous or {}
+
+    previous_entrants = {e['user']['id']: e for e in previous.get('entrants', [])}
+    current_entrants = {e['user']['id']: e for e in current.get('entrants', [])}
+
+    for entrant_id, entrant in current_entrants.items():
+        old = previous_entrants.get(entrant_id)
+        if old is None:
+            diff.added.append(entrant)
+        elif entrant_status(old) != entrant_status(entrant):
+            diff.status_changes.append(EntrantStatusChange(entrant, entrant_status(old), entrant_status(entrant)))
+
+    diff.removed = [e for entrant_id, e in previous_entrants.items() if entrant_id not in current_entrants]
+
+    old_status = previous.get('status', {}).get('value')
+    new_status = current.get('status', {}).get('value')
+    if old_status != new_status:
+        diff.race_status = (old_status, new_status)
+
+    for key in current.keys() | previous.keys():
+        if key in IGNORED_KEYS:
+            continue
+        if previous.get(key) != current.get(key):
+            diff.settings[key] = (previous.get(key), current.get(key))
+
+    return diff
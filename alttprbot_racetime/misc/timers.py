@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Set
+
+
+@dataclass
+class RoomTimer:
+    label: str
+    when: float
+    handle: asyncio.TimerHandle
+
+
+class RoomTimers:
+    """
+    Schedules one-off callbacks for race rooms at exact loop times with loop.call_at, instead of each room polling
+    the clock on its own.  Timers are grouped by room name so a room's timers can be cancelled or replaced together.
+    """
+
+    def __init__(self):
+        self._timers: Dict[str, List[RoomTimer]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(self, room: str, when: float, label: str, callback: Callable[[], Awaitable]):
+        loop = asyncio.get_running_loop()
+        timer = RoomTimer(label=label, when=when, handle=None)
+        timer.handle = loop.call_at(when, self._fire, room, timer, callback)
+        self._timers.setdefault(room, []).append(timer)
+
+    def _fire(self, room: str, timer: RoomTimer, callback: Callable[[], Awaitable]):
+        timers = self._timers.get(room, [])
+        if timer in timers:
+            timers.remove(timer)
+        if not timers:
+            self._timers.pop(room, None)
+
+        task = asyncio.create_task(self._run(room, timer, callback))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, room: str, timer: RoomTimer, callback: Callable[[], Awaitable]):
+        try:
+            await callback()
+        except Exception:
+            logging.exception("Exception while running timer %s for %s", timer.label, room)
+
+    def cancel(self, room: str):
+        for timer in self._timers.pop(room, []):
+            timer.handle.cancel()
+
+    def pending(self) -> Dict[str, List[dict]]:
+        now = asyncio.get_running_loop().time()
+        return {
+            room: [{'label': t.label, 'fires_in': round(t.when - now, 1)} for t in sorted(timers, key=lambda t: t.when)]
+            for room, timers in self._timers.items()
+        }
+
+
+room_timers = RoomTimers()
@@ -0,0 +1,59 @@
+# Benchmarks the async tournament leaderboard rebuild against a throwaway SQLite database.
+# populate_test_data requires DEBUG = True in config.py.
+#
+# Usage (from the repository root):
+#   python -m helpers.benchmark_leaderboard --participants 1500 --pools 4
+
+import argparse
+import asyncio
+import time
+
+from tortoise import Tortoise
+
+from alttprbot import models
+from alttprbot.util import asynctournament
+
+
+async def benchmark(participants: int, pools: int, permalinks_per_pool: int, iterations: int):
+    await Tortoise.init(db_url='sqlite://:memory:', modules={'models': ['alttprbot.models']})
+    await Tortoise.generate_schemas()
+
+    try:
+        tournament = await models.AsyncTournament.create(
+            name="Leaderboard Benchmark",
+            guild_id=1,
+            channel_id=1,
+            owner_id=1,
+        )
+        for p in range(pools):
+            pool = await models.AsyncTournamentPermalinkPool.create(tournament=tournament, name=f"Pool {p + 1}")
+            for i in range(permalinks_per_pool):
+                await models.AsyncTournamentPermalink.create(pool=pool, url=f"https://example.com/{p}/{i}")
+
+        start = time.perf_counter()
+        await asynctournament.populate_test_data(tournament=tournament, participant_count=participants)
+        print(f"Seeded {participants} participants across {pools} pools in {time.perf_counter() - start:.2f}s")
+
+        await asynctournament.calculate_async_tournament(tournament, update_leaderboard=False)
+
+        for i in range(iterations):
+            start = time.perf_counter()
+            await asynctournament.write_leaderboard_snapshot(tournament)
+            print(f"Rebuild {i + 1}: generation {tournament.leaderboard_generation} in {time.perf_counter() - start:.3f}s")
+
+        start = time.perf_counter()
+        leaderboard = await asynctournament.get_leaderboard(tournament, limit=100)
+        print(f"Read first page: {len(leaderboard)} entries in {time.perf_counter() - start:.3f}s")
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the async tournament leaderboard rebuild.")
+    parser.add_argument('--participants', type=int, default=1500)
+    parser.add_argument('--pools', type=int, default=4)
+    parser.add_argument('--permalinks-per-pool', type=int, default=5)
+    parser.add_argument('--iterations', type=int, default=3)
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.participants, args.pools, args.permalinks_per_pool, args.iterations))
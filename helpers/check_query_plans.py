@@ -0,0 +1,58 @@
+# Runs EXPLAIN against the configured MySQL database for the queries behind the async tournament thread buttons,
+# racetime room lookups and audit retention, and exits non-zero if any of them fall back to a full table scan.
+# Run this after adding migrations or changing these queries, against a database with realistic data,
+# since MySQL will happily scan a near-empty table even when a usable index exists.
+#
+# Usage (from the repository root):
+#   python -m helpers.check_query_plans
+
+import asyncio
+import sys
+import urllib.parse
+
+from tortoise import Tortoise
+
+import config
+from alttprbot import models
+
+HOT_QUERIES = {
+    "async race by thread": lambda: models.AsyncTournamentRace.filter(thread_id=1),
+    "async races by tournament, user and status": lambda: models.AsyncTournamentRace.filter(
+        tournament_id=1, user_id=1, status="in_progress"),
+    "async races by permalink for scoring": lambda: models.AsyncTournamentRace.filter(
+        permalink_id=1, status__in=["finished", "forfeit", "disqualified"], reattempted=False),
+    "tournament result by racetime room": lambda: models.TournamentResults.filter(srl_id="alttpr/test-room-0000"),
+    "tournament result by episode": lambda: models.TournamentResults.filter(episode_id="1"),
+    "audit retention batch": lambda: models.AuditMessages.filter(
+        message_date__lte="2000-01-01").order_by("message_date").limit(1000),
+    "audit retention batch for a guild": lambda: models.AuditMessages.filter(
+        guild_id=1, message_date__lte="2000-01-01").order_by("message_date").limit(1000),
+}
+
+
+async def check_query_plans() -> bool:
+    await Tortoise.init(
+        db_url=f'mysql://{config.DB_USER}:{urllib.parse.quote_plus(config.DB_PASS)}@{config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME}',
+        modules={'models': ['alttprbot.models']}
+    )
+
+    ok = True
+    try:
+        conn = Tortoise.get_connection("models")
+        for name, query in HOT_QUERIES.items():
+            plan = await conn.execute_query_dict(f"EXPLAIN {query().sql()}")
+            full_scans = [row['table'] for row in plan if row['type'] == 'ALL']
+            if full_scans:
+                ok = False
+                print(f"FAIL {name}: full table scan on {', '.join(full_scans)}")
+            else:
+                print(f"ok   {name}: using {', '.join(str(row['key']) for row in plan)}")
+    finally:
+        await Tortoise.close_connections()
+
+    return ok
+
+
+if __name__ == '__main__':
+    if not asyncio.run(check_query_plans()):
+        sys.exit(1)
@@ -0,0 +1,32 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `asynctournament` ADD `leaderboard_generation` INT NOT NULL  DEFAULT 0;
+        ALTER TABLE `asynctournament` ADD `leaderboard_updated_at` DATETIME(6);
+        CREATE TABLE IF NOT EXISTS `asynctournamentleaderboardentry` (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `generation` INT NOT NULL,
+    `rank` INT NOT NULL,
+    `estimate_rank` INT NOT NULL,
+    `score` DOUBLE NOT NULL,
+    `estimate` DOUBLE NOT NULL,
+    `finished_race_count` SMALLINT NOT NULL,
+    `forfeited_race_count` SMALLINT NOT NULL,
+    `unattempted_race_count` SMALLINT NOT NULL,
+    `races` JSON NOT NULL,
+    `tournament_id` INT NOT NULL,
+    `user_id` INT NOT NULL,
+    CONSTRAINT `fk_asynctou_asynctou_13f5199c` FOREIGN KEY (`tournament_id`) REFERENCES `asynctournament` (`id`) ON DELETE CASCADE,
+    CONSTRAINT `fk_asynctou_users_ca21a017` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE,
+    KEY `idx_asynctourna_tournam_8e2a02` (`tournament_id`, `generation`, `rank`),
+    KEY `idx_asynctourna_tournam_ca733e` (`tournament_id`, `generation`, `estimate_rank`)
+) CHARACTER SET utf8mb4;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `asynctournament` DROP COLUMN `leaderboard_generation`;
+        ALTER TABLE `asynctournament` DROP COLUMN `leaderboard_updated_at`;
+        DROP TABLE IF EXISTS `asynctournamentleaderboardentry`;"""
@@ -0,0 +1,27 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS `racetime_race_history` (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `rtgg_id` VARCHAR(200) NOT NULL,
+    `race_name` VARCHAR(200) NOT NULL,
+    `category` VARCHAR(50) NOT NULL,
+    `status` VARCHAR(45) NOT NULL,
+    `opened_at` DATETIME(6) NOT NULL,
+    UNIQUE KEY `uid_racetime_ra_rtgg_id_3dae19` (`rtgg_id`, `race_name`),
+    KEY `idx_racetime_ra_rtgg_id_41b390` (`rtgg_id`, `category`, `status`, `opened_at`)
+) CHARACTER SET utf8mb4;
+        CREATE TABLE IF NOT EXISTS `racetime_race_history_sync` (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `rtgg_id` VARCHAR(200) NOT NULL UNIQUE,
+    `last_synced_at` DATETIME(6) NOT NULL,
+    `synced_since` DATETIME(6) NOT NULL
+) CHARACTER SET utf8mb4;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS `racetime_race_history`;
+        DROP TABLE IF EXISTS `racetime_race_history_sync`;"""
@@ -0,0 +1,13 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `audit_messages` ADD INDEX `idx_audit_messa_message_997e1a` (`message_date`);
+        ALTER TABLE `audit_messages` ADD INDEX `idx_audit_messa_guild_i_7035c4` (`guild_id`, `message_date`);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `audit_messages` DROP INDEX `idx_audit_messa_message_997e1a`;
+        ALTER TABLE `audit_messages` DROP INDEX `idx_audit_messa_guild_i_7035c4`;"""
@@ -0,0 +1,24 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `audit_generated_games` ADD `handed_out_at` DATETIME(6);
+        CREATE TABLE IF NOT EXISTS `seed_pool` (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `randomizer` VARCHAR(45) NOT NULL,
+    `preset` VARCHAR(100) NOT NULL,
+    `branch` VARCHAR(45),
+    `tournament` BOOL NOT NULL,
+    `hash_id` VARCHAR(50) NOT NULL,
+    `permalink` VARCHAR(2000) NOT NULL,
+    `created` DATETIME(6) NOT NULL  DEFAULT CURRENT_TIMESTAMP(6),
+    `claimed_at` DATETIME(6),
+    KEY `idx_seed_pool_randomi_5c8e2a` (`randomizer`, `preset`, `branch`, `tournament`, `claimed_at`)
+) CHARACTER SET utf8mb4;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `audit_generated_games` DROP COLUMN `handed_out_at`;
+        DROP TABLE IF EXISTS `seed_pool`;"""
@@ -0,0 +1,19 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `asynctournamentrace` ADD INDEX `idx_asynctourna_thread__244ad6` (`thread_id`);
+        ALTER TABLE `asynctournamentrace` ADD INDEX `idx_asynctourna_tournam_262e6c` (`tournament_id`, `user_id`, `status`);
+        ALTER TABLE `asynctournamentrace` ADD INDEX `idx_asynctourna_permali_ce736d` (`permalink_id`, `status`, `reattempted`);
+        ALTER TABLE `tournament_results` ADD INDEX `idx_tournament__srl_id_458de5` (`srl_id`);
+        ALTER TABLE `tournament_results` ADD INDEX `idx_tournament__episode_0a328c` (`episode_id`);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE `asynctournamentrace` DROP INDEX `idx_asynctourna_thread__244ad6`;
+        ALTER TABLE `asynctournamentrace` DROP INDEX `idx_asynctourna_tournam_262e6c`;
+        ALTER TABLE `asynctournamentrace` DROP INDEX `idx_asynctourna_permali_ce736d`;
+        ALTER TABLE `tournament_results` DROP INDEX `idx_tournament__srl_id_458de5`;
+        ALTER TABLE `tournament_results` DROP INDEX `idx_tournament__episode_0a328c`;"""
@@ -7,8 +7,11 @@ from tortoise import Tortoise
 
 import config
 from alttprbot.exceptions import SahasrahBotException
+from alttprbot.util import http
 from alttprbot_api.api import sahasrahbotapi
 from alttprbot_audit.bot import start_bot as start_audit_bot
+from alttprbot_audit.ingest import audit_message_queue
+from alttprbot_discord.util import guild_config
 from alttprbot_discord.bot import start_bot as start_discord_bot
 from alttprbot_racetime.bot import start_racetime
 
@@ -33,6 +36,7 @@ async def database():
         db_url=f'mysql://{config.DB_USER}:{urllib.parse.quote_plus(config.DB_PASS)}@{config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME}',
         modules={'models': ['alttprbot.models']}
     )
+    await guild_config.store.load()
 
 
 if __name__ == '__main__':
@@ -45,4 +49,8 @@ if __name__ == '__main__':
     loop.create_task(start_audit_bot())
     start_racetime(loop)
     loop.create_task(sahasrahbotapi.run(host='127.0.0.1', port=5001, use_reloader=False, loop=loop))
-    loop.run_forever()
+    try:
+        loop.run_forever()
+    finally:
+        loop.run_until_complete(audit_message_queue.stop())
+        loop.run_until_complete(http.close_sessions())